@@ -14,15 +14,12 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 def main():
     """Основная точка входа для параллельного режима"""
-    # Настройка логирования
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s [%(name)s] %(levelname)s: %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('snapcrawler.log')
-        ]
-    )
+    # Настройка логирования: запись в консоль и файл выполняется в фоновом потоке
+    from snapcrawler.utils.log_formatter import BufferedFileHandler, start_queue_logging
+    start_queue_logging([
+        logging.StreamHandler(),
+        BufferedFileHandler('snapcrawler.log')
+    ])
     
     # Путь к файлу конфигурации
     config_path = sys.argv[1] if len(sys.argv) > 1 else 'config.yaml'
@@ -106,15 +106,23 @@ class CrawlingModule:
                 # Обходим страницу и извлекаем изображения/ссылки
                 images, new_links = self.crawl_page(current_url)
                 
-                # Отправляем найденные изображения в модуль фильтрации
-                for img_url in images:
-                    self.image_queue.put({
+                # Отправляем найденные изображения в модуль фильтрации одним пакетом
+                batch = [
+                    {
                         'type': 'image_url',
                         'url': img_url,
                         'source_page': current_url,
                         'depth': depth
-                    })
-                    self.images_found += 1
+                    }
+                    for img_url in images
+                ]
+                if batch:
+                    if hasattr(self.image_queue, 'put_many'):
+                        self.image_queue.put_many(batch)
+                    else:
+                        for item in batch:
+                            self.image_queue.put(item)
+                    self.images_found += len(batch)
                 
                 # Обновляем компактную статистику
                 if self.compact_formatter:
@@ -166,7 +174,8 @@ class CrawlingModule:
                     'images_found': self.images_found,
                     'depth': depth,
                     'new_links_added': new_links_added,
-                    'queue_size': len(url_queue)
+                    'queue_size': len(url_queue),
+                    'visited_urls': len(self.visited_urls)
                 })
                 
                 # Условие завершения «роста дерева»: на этой глубине нет новых ссылок
@@ -431,8 +440,8 @@ def run_crawling_module(config, image_queue, stats_queue, shutdown_event=None):
         config=config,
         image_queue=image_queue,
         stats_queue=stats_queue,
-        visited_urls=manager.dict(),
-        page_hashes=manager.list(),  # Используем list вместо set
+        # visited_urls и page_hashes нужны только этому процессу: обычные dict и set
+        # по умолчанию не гоняют каждую проверку через сервер Manager
         urls_by_depth=manager.dict()
     )
     module.run()
@@ -13,6 +13,7 @@ import imagehash
 import cv2
 import numpy as np
 import yaml
+from collections import deque
 from typing import Set, Dict, List
 from urllib.parse import urlparse
 import re
@@ -35,6 +36,7 @@ class FilteringModule:
         
         self.shared_queue = shared_queue  # Очередь изображений от модуля обхода
         self.stats_queue = stats_queue    # Очередь статистики
+        self._pending_items = deque()     # Элементы, полученные пакетом через get_many
         
         self.session = requests.Session()
         # Настройка User-Agent для обхода блокировок
@@ -95,7 +97,7 @@ class FilteringModule:
                 # Получаем элемент из очереди (блокирующе, с таймаутом)
                 try:
                     timeout = self.config.get('crawling', {}).get('timeouts', {}).get('queue_timeout', 30)
-                    item = self.shared_queue.get(timeout=timeout)
+                    item = self._next_item(timeout)
                 except queue.Empty:
                     continue
                 
@@ -137,6 +139,14 @@ class FilteringModule:
         self.logger.info(f"Фильтрация завершена. Скачано: {self.downloaded_count}, "
                         f"Обработано: {self.processed_count}, Отфильтровано: {self.filtered_count}")
     
+    def _next_item(self, timeout: float) -> Dict:
+        """Следующий элемент очереди; faster-fifo отдаёт их пакетами через get_many"""
+        if not self._pending_items:
+            if not hasattr(self.shared_queue, 'get_many'):
+                return self.shared_queue.get(timeout=timeout)
+            self._pending_items.extend(self.shared_queue.get_many(timeout=timeout))
+        return self._pending_items.popleft()
+    
     def process_image(self, item: Dict):
         """Скачивание и фильтрация одного изображения"""
         image_url = item['url']
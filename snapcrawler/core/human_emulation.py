@@ -2,24 +2,269 @@
 Модуль для эмуляции человеческого поведения в браузере
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Final, Optional, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
 from scrapy_playwright.page import PageMethod
 
 
-@dataclass
+# Сборщики кешируются по значениям конфигурации: экземпляры модулей
+# с одинаковой конфигурацией получают один и тот же объект строки
+@lru_cache(maxsize=32)
+def _build_emulation_script(scroll_speed: int, max_interactions: int, pause_ms: int) -> str:
+    """JavaScript для инициализации эмуляции с подставленными значениями конфигурации"""
+    return f"""
+() => {{
+    window.humanEmulation = {{
+        enabled: true,
+        scrollSpeed: {scroll_speed},
+        maxInteractions: {max_interactions},
+        scrollPauseTime: {pause_ms},
+        interactions: 0
+    }};
+
+    window.randomDelay = (min, max) => {{
+        return new Promise(resolve => {{
+            const delay = Math.random() * (max - min) + min;
+            setTimeout(resolve, delay * 1000);
+        }});
+    }};
+}}
+"""
+
+
+@lru_cache(maxsize=32)
+def _build_interaction_script(max_interactions: int, click_lo: float, click_hi: float) -> str:
+    """JavaScript для выполнения взаимодействий с константами из конфигурации"""
+    return f"""
+async () => {{
+    const emulation = window.humanEmulation;
+
+    // Простой скролл вниз
+    for (let i = 0; i < 3 && emulation.interactions < {max_interactions}; i++) {{
+        window.scrollBy(0, 400);
+        await window.randomDelay({click_lo}, {click_hi});
+        emulation.interactions++;
+    }}
+}}
+"""
+
+
+# JavaScript для сбора обнаруженных изображений
+_COLLECTION_SCRIPT: Final[str] = """
+() => {
+    // Поля всегда заполняются в одном порядке и с одними типами,
+    // чтобы объект результата имел одну форму на всех страницах.
+    // Взаимодействия пока не собирают изображения сами по себе
+    const emulation = window.humanEmulation;
+    return {
+        humanEmulationImages: [],
+        shadowDomImages: [],
+        canvasImages: [],
+        totalInteractions: emulation ? emulation.interactions | 0 : 0
+    };
+}
+"""
+
+# JavaScript для настройки захвата сетевого трафика
+_NETWORK_SETUP_SCRIPT: Final[str] = """
+() => {
+    window.networkCapture = {
+        imageUrls: new Set(),
+        apiResponses: [],
+        websocketMessages: []
+    };
+}
+"""
+
+# JavaScript для сбора данных сетевого трафика
+_NETWORK_COLLECTION_SCRIPT: Final[str] = """
+() => {
+    const capturedData = window.networkCapture || {
+        imageUrls: new Set(),
+        apiResponses: [],
+        websocketMessages: []
+    };
+
+    // Один проход с push вместо промежуточных массивов flatMap
+    const apiImageUrls = [];
+    for (const response of capturedData.apiResponses) {
+        if (response.imageUrls) for (const url of response.imageUrls) apiImageUrls.push(url);
+    }
+    const websocketImageUrls = [];
+    for (const msg of capturedData.websocketMessages) {
+        if (msg.imageUrls) for (const url of msg.imageUrls) websocketImageUrls.push(url);
+    }
+
+    // Фиксированный порядок полей - одна форма объекта для всех страниц
+    return {
+        networkImageUrls: [...capturedData.imageUrls],
+        apiImageUrls: apiImageUrls,
+        websocketImageUrls: websocketImageUrls,
+        totalApiResponses: capturedData.apiResponses.length | 0,
+        totalWebsocketMessages: capturedData.websocketMessages.length | 0
+    };
+}
+"""
+
+# Проход по base64 изображениям: src есть только у img, поэтому обходим
+# document.images вместо селектора по всему DOM. Одинаковые data URI
+# (спрайты, иконки) отдаем один раз
+_HIDDEN_BASE64_JS: Final[str] = """
+    const extractBase64 = () => {
+        const seenBase64 = new Set();
+        for (const el of document.images) {
+            const src = el.src;
+            if (src && src.startsWith('data:image') && !seenBase64.has(src)) {
+                seenBase64.add(src);
+                extraction.base64Images.push(src);
+            }
+        }
+    };
+"""
+
+# Проход по canvas: только описания (размер, id, CSS-селектор), без кодирования пикселей
+_HIDDEN_CANVAS_JS: Final[str] = """
+    // CSS-путь до элемента, чтобы позже найти canvas повторно
+    const cssPath = (el) => {
+        const parts = [];
+        while (el && el.nodeType === 1 && el !== document.body) {
+            if (el.id) {
+                parts.unshift('#' + CSS.escape(el.id));
+                break;
+            }
+            let index = 1;
+            for (let sib = el.previousElementSibling; sib; sib = sib.previousElementSibling) {
+                if (sib.tagName === el.tagName) index++;
+            }
+            parts.unshift(el.tagName.toLowerCase() + ':nth-of-type(' + index + ')');
+            el = el.parentElement;
+        }
+        return parts.join(' > ');
+    };
+
+    const describeCanvases = () => {
+        for (const canvas of document.querySelectorAll('canvas')) {
+            if (!canvas.width || !canvas.height) continue;
+            extraction.canvasImages.push({
+                width: canvas.width,
+                height: canvas.height,
+                id: canvas.id || null,
+                selector: cssPath(canvas)
+            });
+        }
+    };
+"""
+
+
+@lru_cache(maxsize=4)
+def _build_hidden_extraction_script(extract_base64: bool, extract_canvas: bool) -> str:
+    """JavaScript для извлечения скрытых изображений только с включенными проходами"""
+    blocks = []
+    passes = []
+    if extract_base64:
+        blocks.append(_HIDDEN_BASE64_JS)
+        passes.append('extractBase64();')
+    if extract_canvas:
+        blocks.append(_HIDDEN_CANVAS_JS)
+        passes.append('describeCanvases();')
+    
+    return f"""
+() => {{
+    const extraction = window.hiddenImageExtraction = {{
+        base64Images: [],
+        canvasImages: [],
+        webglImages: [],
+        shadowDomImages: []
+    }};
+{''.join(blocks)}
+    // Проходы синхронные и независимы друг от друга — вызываются по очереди
+    {' '.join(passes)}
+}}
+"""
+
+# JavaScript для сбора скрытых изображений
+_HIDDEN_COLLECTION_SCRIPT: Final[str] = """
+() => {
+    const hiddenData = window.hiddenImageExtraction || {
+        base64Images: [],
+        canvasImages: [],
+        webglImages: [],
+        shadowDomImages: []
+    };
+
+    // Фиксированный порядок полей - одна форма объекта для всех страниц
+    const totalHiddenImages = hiddenData.base64Images.length +
+                              hiddenData.canvasImages.length +
+                              hiddenData.webglImages.length +
+                              hiddenData.shadowDomImages.length;
+    return {
+        base64Images: hiddenData.base64Images,
+        canvasImages: hiddenData.canvasImages,
+        webglImages: hiddenData.webglImages,
+        shadowDomImages: hiddenData.shadowDomImages,
+        totalHiddenImages: totalHiddenImages | 0
+    };
+}
+"""
+
+
+def _timeout(config: Dict[str, Any], key: str, default: int) -> int:
+    """Таймаут из секции crawling.timeouts полной конфигурации"""
+    return int(config.get('crawling', {}).get('timeouts', {}).get(key, default))
+
+
+# Разрешенные таймауты по id конфигурации: модули обычно создаются с одним
+# и тем же словарем. Рядом хранится сам словарь, чтобы повторно
+# использованный id другого объекта не дал чужие значения
+_TIMEOUT_CACHE: Dict[int, Tuple[Dict[str, Any], Dict[str, int]]] = {}
+_TIMEOUT_CACHE_SIZE = 32
+
+
+def _timeouts(config: Dict[str, Any]) -> Dict[str, int]:
+    """Все таймауты модулей для конфигурации, разрешенные один раз"""
+    entry = _TIMEOUT_CACHE.get(id(config))
+    if entry is None or entry[0] is not config:
+        entry = (config, {
+            'page_load': _timeout(config, 'page_load_timeout', 2000),
+            'dom_stabilization': _timeout(config, 'dom_stabilization_timeout', 3000),
+            'network_activity': _timeout(config, 'network_activity_timeout', 5000),
+            'hidden_processing': _timeout(config, 'hidden_processing_timeout', 2000),
+        })
+        if len(_TIMEOUT_CACHE) >= _TIMEOUT_CACHE_SIZE:
+            _TIMEOUT_CACHE.clear()
+        _TIMEOUT_CACHE[id(config)] = entry
+    return entry[1]
+
+
+@lru_cache(maxsize=32)
+def _fuse_scripts(*steps) -> str:
+    """Объединяет скрипты и паузы (мс) в одну async-функцию для одного evaluate
+
+    Каждый evaluate - отдельный round-trip до браузера, поэтому
+    шаги выполняются внутри страницы, а наружу возвращается результат
+    последнего скрипта.
+    """
+    body = []
+    for index, step in enumerate(steps):
+        if isinstance(step, int):
+            body.append(f"    await new Promise(resolve => setTimeout(resolve, {step}));")
+        elif index == len(steps) - 1:
+            body.append(f"    return await ({step.strip()})();")
+        else:
+            body.append(f"    await ({step.strip()})();")
+    return "\nasync () => {\n" + "\n".join(body) + "\n}\n"
+
+
+@dataclass(slots=True, frozen=True)
 class HumanEmulationConfig:
     """Конфигурация эмуляции человеческого поведения"""
     enabled: bool = True
     scroll_speed: int = 1000  # пикселей в секунду
-    click_delay: List[float] = None  # диапазон задержек для кликов
+    click_delay: Tuple[float, float] = (1.0, 3.0)  # диапазон задержек для кликов
     max_interactions: int = 100
     scroll_pause_time: float = 3.0
     max_scroll_attempts: int = 15
-    
-    def __post_init__(self):
-        if self.click_delay is None:
-            self.click_delay = [1.0, 3.0]
 
 
 class HumanEmulationModule:
@@ -33,92 +278,44 @@ class HumanEmulationModule:
         self.config = HumanEmulationConfig(
             enabled=human_config.get('enabled', True),
             scroll_speed=human_config.get('scroll_speed', 1000),
-            click_delay=human_config.get('click_delay', [1.0, 3.0]),
+            click_delay=tuple(human_config.get('click_delay', (1.0, 3.0))),
             max_interactions=human_config.get('max_interactions', 50),
             scroll_pause_time=human_config.get('scroll_pause_time', 2.0),
             max_scroll_attempts=human_config.get('max_scroll_attempts', 10)
         )
         
-        # Сохраняем полную конфигурацию для доступа к таймаутам
-        self.full_config = full_config
+        # Скрипты специализируются под конфигурацию один раз при создании
+        self._emulation_script = _build_emulation_script(
+            int(self.config.scroll_speed),
+            int(self.config.max_interactions),
+            int(self.config.scroll_pause_time * 1000),
+        )
+        self._interaction_script = _build_interaction_script(
+            int(self.config.max_interactions),
+            float(self.config.click_delay[0]),
+            float(self.config.click_delay[1]),
+        )
+        
+        # Конфигурация не меняется после создания, поэтому список
+        # PageMethod собирается один раз
+        timeouts = _timeouts(full_config)
+        self._page_load_timeout = timeouts['page_load']
+        self._dom_stabilization_timeout = timeouts['dom_stabilization']
+        
+        # Инициализация -> ожидание загрузки -> взаимодействия ->
+        # стабилизация DOM -> сбор данных, всё в одном evaluate
+        self._fused_script = _fuse_scripts(
+            self._emulation_script,
+            self._page_load_timeout,
+            self._interaction_script,
+            self._dom_stabilization_timeout,
+            _COLLECTION_SCRIPT,
+        )
+        self._page_methods = [PageMethod('evaluate', self._fused_script)]
     
     def get_page_methods(self) -> List[PageMethod]:
         """Возвращает список PageMethod для Playwright"""
-        if not self.config.enabled:
-            return []
-        
-        return [
-            # Инициализация эмуляции
-            PageMethod('evaluate', self._get_emulation_script()),
-            
-            # Ожидание загрузки страницы
-            PageMethod('wait_for_timeout', self.full_config.get('crawling', {}).get('timeouts', {}).get('page_load_timeout', 2000)),
-            
-            # Выполнение человеческих взаимодействий
-            PageMethod('evaluate', self._get_interaction_script()),
-            
-            # Ожидание стабилизации DOM
-            PageMethod('wait_for_timeout', self.full_config.get('crawling', {}).get('timeouts', {}).get('dom_stabilization_timeout', 3000)),
-            
-            # Финальный сбор данных
-            PageMethod('evaluate', self._get_collection_script()),
-        ]
-    
-    def _get_emulation_script(self) -> str:
-        """JavaScript для инициализации эмуляции человеческого поведения"""
-        return """
-        () => {
-            window.humanEmulation = {
-                enabled: true,
-                scrollSpeed: 1000,
-                maxInteractions: 50,
-                scrollPauseTime: 2000,
-                interactions: 0,
-                discoveredImages: new Set()
-            };
-            
-            window.randomDelay = (min, max) => {
-                return new Promise(resolve => {
-                    const delay = Math.random() * (max - min) + min;
-                    setTimeout(resolve, delay * 1000);
-                });
-            };
-            
-            console.log('Human emulation initialized');
-        }
-        """
-    
-    def _get_interaction_script(self) -> str:
-        """JavaScript для выполнения человеческих взаимодействий"""
-        return """
-        async () => {
-            const emulation = window.humanEmulation;
-            
-            // Простой скролл вниз
-            for (let i = 0; i < 3 && emulation.interactions < emulation.maxInteractions; i++) {
-                window.scrollBy(0, 400);
-                await window.randomDelay(1, 2);
-                emulation.interactions++;
-            }
-            
-            console.log('Human interactions completed:', emulation.interactions);
-        }
-        """
-    
-    def _get_collection_script(self) -> str:
-        """JavaScript для сбора обнаруженных изображений"""
-        return """
-        () => {
-            const discoveredImages = Array.from(window.humanEmulation.discoveredImages || []);
-            
-            return {
-                humanEmulationImages: discoveredImages,
-                shadowDomImages: [],
-                canvasImages: [],
-                totalInteractions: window.humanEmulation.interactions
-            };
-        }
-        """
+        return self._page_methods if self.config.enabled else []
 
 
 class NetworkTrafficCapture:
@@ -132,58 +329,20 @@ class NetworkTrafficCapture:
         self.capture_websockets = network_config.get('capture_websockets', False)
         self.image_domains = network_config.get('image_domains', [])
         
-        # Сохраняем полную конфигурацию для доступа к таймаутам
-        self.full_config = config if config else {}
+        # Из полной конфигурации нужен только таймаут
+        self._network_activity_timeout = _timeouts(config or {})['network_activity']
+        
+        # Настройка захвата -> ожидание активности -> сбор данных
+        self._fused_script = _fuse_scripts(
+            _NETWORK_SETUP_SCRIPT,
+            self._network_activity_timeout,
+            _NETWORK_COLLECTION_SCRIPT,
+        )
+        self._page_methods = [PageMethod('evaluate', self._fused_script)]
     
     def get_page_methods(self) -> List[PageMethod]:
         """Возвращает список PageMethod для Playwright"""
-        if not self.enabled:
-            return []
-        
-        return [
-            # Настройка захвата трафика
-            PageMethod('evaluate', self._get_network_setup_script()),
-            
-            # Ожидание активности
-            PageMethod('wait_for_timeout', self.full_config.get('crawling', {}).get('timeouts', {}).get('network_activity_timeout', 5000)),
-            
-            # Сбор данных трафика
-            PageMethod('evaluate', self._get_network_collection_script()),
-        ]
-    
-    def _get_network_setup_script(self) -> str:
-        """JavaScript для настройки захвата сетевого трафика"""
-        return """
-        () => {
-            window.networkCapture = {
-                imageUrls: new Set(),
-                apiResponses: [],
-                websocketMessages: []
-            };
-            
-            console.log('Network capture initialized');
-        }
-        """
-    
-    def _get_network_collection_script(self) -> str:
-        """JavaScript для сбора данных сетевого трафика"""
-        return """
-        () => {
-            const capturedData = window.networkCapture || {
-                imageUrls: new Set(),
-                apiResponses: [],
-                websocketMessages: []
-            };
-            
-            return {
-                networkImageUrls: Array.from(capturedData.imageUrls),
-                apiImageUrls: capturedData.apiResponses.flatMap(response => response.imageUrls || []),
-                websocketImageUrls: capturedData.websocketMessages.flatMap(msg => msg.imageUrls || []),
-                totalApiResponses: capturedData.apiResponses.length,
-                totalWebsocketMessages: capturedData.websocketMessages.length
-            };
-        }
-        """
+        return self._page_methods if self.enabled else []
 
 
 class HiddenImageExtractor:
@@ -196,84 +355,102 @@ class HiddenImageExtractor:
         self.enabled = hidden_config.get('enabled', True)
         self.extract_base64 = hidden_config.get('extract_base64', True)
         self.extract_canvas = hidden_config.get('extract_canvas', True)
-        self.extract_webgl = hidden_config.get('extract_webgl', False)
-        self.extract_shadow_dom = hidden_config.get('extract_shadow_dom', True)
         
-        # Сохраняем полную конфигурацию для доступа к таймаутам
-        self.full_config = config if config else {}
+        # Из полной конфигурации нужен только таймаут
+        self._hidden_processing_timeout = _timeouts(config or {})['hidden_processing']
+        
+        # В скрипт попадают только включенные проходы
+        self._extraction_script = _build_hidden_extraction_script(
+            bool(self.extract_base64), bool(self.extract_canvas)
+        )
+        
+        # Извлечение -> ожидание обработки -> сбор результатов
+        self._fused_script = _fuse_scripts(
+            self._extraction_script,
+            self._hidden_processing_timeout,
+            _HIDDEN_COLLECTION_SCRIPT,
+        )
+        self._page_methods = [PageMethod('evaluate', self._fused_script)]
 
     def get_page_methods(self) -> List[PageMethod]:
         """Возвращает список PageMethod для Playwright"""
-        if not self.enabled:
-            return []
+        return self._page_methods if self.enabled else []
+
+
+# Короткий вызов установленной init-скриптом функции вместо передачи
+# всего тела скрипта в каждый evaluate
+_COMBINED_RUN_SCRIPT: Final[str] = "() => window.__scBrowserEmulation ? window.__scBrowserEmulation() : null"
+
+
+class CombinedBrowserEmulation:
+    """Объединяет эмуляцию, захват трафика и скрытые изображения в один evaluate
+
+    Скрипты устанавливаются на страницу через add_init_script в
+    init_page (playwright_page_init_callback) до навигации: настройка
+    window.* выполняется при создании документа, а сам evaluate лишь
+    вызывает window.__scBrowserEmulation().
+
+    Результат evaluate: {human: {...}, network: {...}, hidden: {...}};
+    для отключенных модулей соответствующее поле равно null.
+    """
+    
+    # Вызов установленной функции одинаков для всех экземпляров
+    _RUN_METHOD = PageMethod('evaluate', _COMBINED_RUN_SCRIPT)
+    
+    def __init__(self, human: Optional[HumanEmulationModule] = None,
+                 network: Optional[NetworkTrafficCapture] = None,
+                 hidden: Optional[HiddenImageExtractor] = None):
+        self.human = human if human and human.config.enabled else None
+        self.network = network if network and network.enabled else None
+        self.hidden = hidden if hidden and hidden.enabled else None
         
-        return [
-            # Извлечение скрытых изображений
-            PageMethod('evaluate', self._get_hidden_extraction_script()),
-            
-            # Ожидание обработки
-            PageMethod('wait_for_timeout', self.full_config.get('crawling', {}).get('timeouts', {}).get('hidden_processing_timeout', 2000)),
-            
-            # Сбор результатов
-            PageMethod('evaluate', self._get_hidden_collection_script()),
-        ]
+        if self.human or self.network or self.hidden:
+            self._init_script = self._build_init_script()
+            self._page_methods = [self._RUN_METHOD]
+        else:
+            self._init_script = None
+            self._page_methods = []
     
-    def _get_hidden_extraction_script(self) -> str:
-        """JavaScript для извлечения скрытых изображений"""
-        return """
-        () => {
-            window.hiddenImageExtraction = {
-                base64Images: [],
-                canvasImages: [],
-                webglImages: [],
-                shadowDomImages: []
-            };
-            
-            // Простое извлечение base64 изображений
-            const dataUriElements = document.querySelectorAll('[src^="data:image"]');
-            dataUriElements.forEach(el => {
-                if (el.src) {
-                    window.hiddenImageExtraction.base64Images.push(el.src);
-                }
-            });
-            
-            // Простое извлечение из canvas
-            const canvases = document.querySelectorAll('canvas');
-            canvases.forEach(canvas => {
-                try {
-                    const dataUrl = canvas.toDataURL('image/png');
-                    if (dataUrl && dataUrl !== 'data:,') {
-                        window.hiddenImageExtraction.canvasImages.push(dataUrl);
-                    }
-                } catch (e) {
-                    // Canvas может быть tainted
-                }
-            });
-            
-            console.log('Hidden image extraction completed');
-        }
-        """
+    def get_page_methods(self) -> List[PageMethod]:
+        """Возвращает список PageMethod для Playwright"""
+        return self._page_methods
     
-    def _get_hidden_collection_script(self) -> str:
-        """JavaScript для сбора скрытых изображений"""
-        return """
-        () => {
-            const hiddenData = window.hiddenImageExtraction || {
-                base64Images: [],
-                canvasImages: [],
-                webglImages: [],
-                shadowDomImages: []
-            };
-            
-            return {
-                base64Images: hiddenData.base64Images,
-                canvasImages: hiddenData.canvasImages,
-                webglImages: hiddenData.webglImages,
-                shadowDomImages: hiddenData.shadowDomImages,
-                totalHiddenImages: hiddenData.base64Images.length + 
-                                 hiddenData.canvasImages.length + 
-                                 hiddenData.webglImages.length + 
-                                 hiddenData.shadowDomImages.length
-            };
-        }
-        """
+    async def init_page(self, page, request) -> None:
+        """Колбэк playwright_page_init_callback: ставит init-скрипт до навигации"""
+        if self._init_script:
+            await page.add_init_script(script=self._init_script)
+    
+    def _build_init_script(self) -> str:
+        """JavaScript init-скрипта: настройка модулей и функция запуска"""
+        setup = []
+        waits = []
+        extraction = []
+        
+        if self.human:
+            setup.append(f"({self.human._emulation_script.strip()})();")
+            waits.append(
+                f"(async () => {{ await sleep({self.human._page_load_timeout}); "
+                f"await ({self.human._interaction_script.strip()})(); "
+                f"await sleep({self.human._dom_stabilization_timeout}); }})()"
+            )
+        if self.network:
+            setup.append(f"({_NETWORK_SETUP_SCRIPT.strip()})();")
+            waits.append(f"sleep({self.network._network_activity_timeout})")
+        if self.hidden:
+            # Извлечение выполняется после ожидания, когда подгружены
+            # ленивые изображения
+            extraction.append(f"({self.hidden._extraction_script.strip()})();")
+        
+        human = f"({_COLLECTION_SCRIPT.strip()})()" if self.human else "null"
+        network = f"({_NETWORK_COLLECTION_SCRIPT.strip()})()" if self.network else "null"
+        hidden = f"({_HIDDEN_COLLECTION_SCRIPT.strip()})()" if self.hidden else "null"
+        
+        return (
+            "\n".join(setup) + "\n"
+            "window.__scBrowserEmulation = async () => {\n"
+            "const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));\n"
+            + "await Promise.all([" + ", ".join(waits) + "]);\n"
+            + "\n".join(extraction) + "\n"
+            + f"return {{human: {human}, network: {network}, hidden: {hidden}}};\n"
+            "};\n"
+        )
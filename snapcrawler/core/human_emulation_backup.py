@@ -5,10 +5,540 @@ import asyncio
 import random
 import time
 import json
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from scrapy_playwright.page import PageMethod
 
 
+# Единая функция извлечения src для всех скриптов: одна точка вызова вместо
+# трёх копий одной и той же логики (img.src / data-src / background-image)
+_EXTRACT_SRC_SCRIPT = r"""
+            window.__scExtractSrc = window.__scExtractSrc || function(img) {
+                const s = img.src;
+                if (s) return s;
+                const ds = img.dataset && img.dataset.src;
+                if (ds) return ds;
+                const st = img.style;
+                if (st) {
+                    const bg = st.backgroundImage;
+                    if (bg) {
+                        const m = bg.match(/url\(["']?([^"')]+)/);
+                        if (m) return m[1];
+                    }
+                }
+                return null;
+            };
+"""
+
+
+def _config_header(values: Dict[str, Any]) -> str:
+    """JS-заголовок с конфигурацией: значения экранируются через json.dumps"""
+    return "const CFG = " + json.dumps(values) + ";"
+
+
+def _freeze(values: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    """Приводит конфигурацию скрипта к хешируемому виду для lru_cache"""
+    return tuple(sorted(
+        (key, _freeze(value) if isinstance(value, dict)
+         else tuple(value) if isinstance(value, list) else value)
+        for key, value in values.items()
+    ))
+
+
+# Сборщики скриптов вынесены на уровень модуля: для одинаковой конфигурации
+# все экземпляры получают один и тот же объект строки
+@lru_cache(maxsize=16)
+def _build_emulation_script(cfg: Tuple[Tuple[str, Any], ...]) -> str:
+    """JavaScript для инициализации эмуляции человеческого поведения"""
+    return f"""
+    () => {{
+        {_config_header(dict(cfg))}
+        {_EXTRACT_SRC_SCRIPT}
+        // Сохраняем буфер WebGL, чтобы его можно было скопировать при извлечении
+        if (!window.__scGlHooked) {{
+            window.__scGlHooked = true;
+            const origGetContext = HTMLCanvasElement.prototype.getContext;
+            HTMLCanvasElement.prototype.getContext = function(type, attrs) {{
+                if (type === 'webgl' || type === 'webgl2' || type === 'experimental-webgl') {{
+                    attrs = Object.assign({{}}, attrs, {{ preserveDrawingBuffer: true }});
+                }}
+                return origGetContext.call(this, type, attrs);
+            }};
+        }}
+        
+        // Глобальные переменные для эмуляции
+        window.humanEmulation = {{
+            discoveredImages: new Set(),
+            interactions: 0,
+            maxInteractions: CFG.maxInteractions,
+            scrollAttempts: 0,
+            maxScrollAttempts: CFG.maxScrollAttempts,
+            lastScrollHeight: 0,
+            isScrolling: false
+        }};
+    
+        // Функция для случайной задержки
+        window.randomDelay = (min, max) => {{
+            return new Promise(resolve => {{
+                const delay = Math.random() * (max - min) + min;
+                setTimeout(resolve, delay * 1000);
+            }});
+        }};
+    
+        // Функция для эмуляции движения мыши
+        window.simulateMouseMovement = () => {{
+            const event = new MouseEvent('mousemove', {{
+                clientX: Math.random() * window.innerWidth,
+                clientY: Math.random() * window.innerHeight,
+                bubbles: true
+            }});
+            document.dispatchEvent(event);
+        }};
+    
+        // Мониторинг мутаций DOM для обнаружения новых изображений
+        const observer = new MutationObserver(mutations => {{
+            mutations.forEach(mutation => {{
+                if (mutation.type === 'childList') {{
+                    mutation.addedNodes.forEach(node => {{
+                        if (node.nodeType === Node.ELEMENT_NODE) {{
+                            // Проверяем img теги
+                            const images = node.tagName === 'IMG' ? [node] : node.querySelectorAll('img');
+                            images.forEach(img => {{
+                                const src = window.__scExtractSrc(img);
+                                if (src) window.humanEmulation.discoveredImages.add(src);
+                            }});
+                        }}
+                    }});
+                }}
+            }});
+        }});
+    
+        // Наблюдаем только за контейнерами, куда обычно подгружается контент;
+        // если таких нет - за body
+        const observerRoots = document.querySelectorAll('main, article, [role="main"], .feed, .gallery, .posts, .content, .masonry');
+        if (observerRoots.length === 0) {{
+            observer.observe(document.body, {{ childList: true, subtree: true }});
+        }} else {{
+            for (const root of observerRoots) {{
+                observer.observe(root, {{ childList: true, subtree: true }});
+            }}
+        }}
+    
+        console.log('Human emulation initialized');
+    }}
+    """
+
+
+@lru_cache(maxsize=16)
+def _build_interaction_script(cfg: Tuple[Tuple[str, Any], ...]) -> str:
+    """JavaScript для выполнения человеческих взаимодействий"""
+    return f"""
+    async () => {{
+        {_config_header(dict(cfg))}
+        const emulation = window.humanEmulation;
+    
+        // Функция для плавного скролла
+        const smoothScroll = async (distance) => {{
+            const startY = window.pageYOffset;
+            const targetY = startY + distance;
+            const duration = Math.abs(distance) / CFG.scrollSpeed * 1000;
+            const startTime = performance.now();
+    
+            return new Promise(resolve => {{
+                const scroll = (currentTime) => {{
+                    const elapsed = currentTime - startTime;
+                    const progress = Math.min(elapsed / duration, 1);
+    
+                    // Easing function для естественного скролла
+                    const easeProgress = progress < 0.5 
+                        ? 2 * progress * progress 
+                        : 1 - Math.pow(-2 * progress + 2, 3) / 2;
+    
+                    window.scrollTo(0, startY + (targetY - startY) * easeProgress);
+    
+                    if (progress < 1) {{
+                        requestAnimationFrame(scroll);
+                    }} else {{
+                        resolve();
+                    }}
+                }};
+                requestAnimationFrame(scroll);
+            }});
+        }};
+    
+        // Основной цикл взаимодействий
+        while (emulation.interactions < emulation.maxInteractions && 
+               emulation.scrollAttempts < emulation.maxScrollAttempts) {{
+    
+            const currentHeight = document.documentElement.scrollHeight;
+    
+            // Если высота не изменилась несколько раз подряд - прекращаем
+            if (currentHeight === emulation.lastScrollHeight) {{
+                emulation.scrollAttempts++;
+            }} else {{
+                emulation.scrollAttempts = 0;
+                emulation.lastScrollHeight = currentHeight;
+            }}
+    
+            // Случайное движение мыши
+            window.simulateMouseMovement();
+    
+            // Поиск и клик по кнопкам "Load More"
+            // (:contains() не является CSS-селектором — фильтруем по тексту вручную)
+            const candidates = document.querySelectorAll(
+                'button, a, [data-load], [data-more], .load-more, .show-more, .pagination-next'
+            );
+            const loadMoreButtons = [];
+            for (let i = 0, l = candidates.length; i < l; i++) {{
+                const t = candidates[i].textContent;
+                if ((t && /load|more|next/i.test(t)) ||
+                    candidates[i].matches('[data-load], [data-more], .load-more, .show-more, .pagination-next')) {{
+                    loadMoreButtons.push(candidates[i]);
+                }}
+            }}
+    
+            if (loadMoreButtons.length > 0 && Math.random() < 0.3) {{
+                const button = loadMoreButtons[Math.floor(Math.random() * loadMoreButtons.length)];
+                if (button.offsetParent !== null) {{ // видимая кнопка
+                    // Скролл к кнопке
+                    button.scrollIntoView({{ behavior: 'smooth', block: 'center' }});
+                    await window.randomDelay(1, 2);
+    
+                    // Hover эффект
+                    button.dispatchEvent(new MouseEvent('mouseenter', {{ bubbles: true }}));
+                    await window.randomDelay(0.5, 1);
+    
+                    // Клик
+                    button.click();
+                    await window.randomDelay(CFG.clickDelayMin, CFG.clickDelayMax);
+    
+                    emulation.interactions++;
+                    continue;
+                }}
+            }}
+    
+            // Скролл вниз
+            const scrollDistance = Math.random() * 800 + 400; // 400-1200px
+            await smoothScroll(scrollDistance);
+    
+            // Отдаём управление браузеру, чтобы завершились layout/paint после скролла
+            await new Promise(r => window.requestIdleCallback
+                ? window.requestIdleCallback(r, {{ timeout: 50 }})
+                : setTimeout(r, 0));
+    
+            // Пауза для загрузки контента
+            await window.randomDelay(CFG.scrollPauseMs * 0.5 / 1000, CFG.scrollPauseMs * 1.5 / 1000);
+    
+            // Проверка на infinite scroll
+            const isNearBottom = (window.innerHeight + window.pageYOffset) >= 
+                               document.documentElement.scrollHeight - 1000;
+    
+            if (isNearBottom) {{
+                // Дополнительная пауза для lazy loading
+                await window.randomDelay(2, 4);
+            }}
+    
+            emulation.interactions++;
+        }}
+    
+        // Финальный скролл вверх для активации lazy loading
+        await smoothScroll(-window.pageYOffset / 2);
+        await window.randomDelay(1, 2);
+    
+        console.log('Human emulation completed: ' + emulation.interactions + ' interactions, ' + emulation.discoveredImages.size + ' images discovered');
+    }}
+    """
+
+
+@lru_cache(maxsize=16)
+def _build_network_setup_script(cfg: Tuple[Tuple[str, Any], ...]) -> str:
+    """JavaScript для настройки захвата сетевого трафика"""
+    return f"""
+    () => {{
+        {_config_header(dict(cfg))}
+    
+        window.networkCapture = {{
+            imageUrls: new Set(),
+            apiResponses: [],
+            websocketMessages: []
+        }};
+    
+        // Перехват fetch запросов
+        const originalFetch = window.fetch;
+        window.fetch = async function(...args) {{
+            const response = await originalFetch.apply(this, args);
+    
+            // Клонируем response для анализа
+            const clonedResponse = response.clone();
+    
+            try {{
+                const contentType = response.headers.get('content-type') || '';
+    
+                // Если это изображение
+                if (contentType.startsWith('image/')) {{
+                    window.networkCapture.imageUrls.add(response.url);
+                }}
+    
+                // Если это JSON - ищем URL изображений
+                if (contentType.includes('application/json') && CFG.captureJson) {{
+                    const jsonData = await clonedResponse.json();
+                    const imageUrls = extractImageUrlsFromJson(jsonData);
+                    imageUrls.forEach(url => window.networkCapture.imageUrls.add(url));
+    
+                    window.networkCapture.apiResponses.push({{
+                        url: response.url,
+                        data: jsonData,
+                        imageUrls: imageUrls
+                    }});
+                }}
+            }} catch (e) {{
+                console.debug('Network capture error:', e);
+            }}
+    
+            return response;
+        }};
+    
+        // Функция для извлечения URL из JSON
+        function extractImageUrlsFromJson(obj, urls = []) {{
+            if (typeof obj === 'string') {{
+                // Дешёвые отсечения до регулярных выражений
+                if (obj.length < 12 || obj.length > 2048) return urls;
+                const c0 = obj.charCodeAt(0);
+                if (c0 !== 104 /* 'h' */ && c0 !== 47 /* '/' */ && c0 !== 46 /* '.' */) return urls;
+                if (obj.indexOf('.') === -1 && obj.indexOf('/') === -1) return urls;
+                // Проверяем на URL изображения
+                if (/\\.(jpg|jpeg|png|gif|webp|avif|svg|bmp|tiff)($|\\?)/i.test(obj) ||
+                    /^https?:\\/\\/.*\\/(image|img|photo|picture)/i.test(obj)) {{
+                    urls.push(obj);
+                }}
+            }} else if (Array.isArray(obj)) {{
+                obj.forEach(item => extractImageUrlsFromJson(item, urls));
+            }} else if (obj && typeof obj === 'object') {{
+                Object.keys(obj).forEach(key => {{
+                    // Ключи, которые часто содержат изображения
+                    if (key.length >= 3 && key.length <= 12 &&
+                        /^(image|img|photo|picture|thumbnail|avatar|banner|background)$/i.test(key)) {{
+                        if (typeof obj[key] === 'string') {{
+                            urls.push(obj[key]);
+                        }}
+                    }}
+                    extractImageUrlsFromJson(obj[key], urls);
+                }});
+            }}
+            return urls;
+        }}
+    
+        // WebSocket перехват (если включен)
+        if (CFG.captureWebsockets) {{
+            const originalWebSocket = window.WebSocket;
+            window.WebSocket = function(url, protocols) {{
+                const ws = new originalWebSocket(url, protocols);
+    
+                const originalOnMessage = ws.onmessage;
+                ws.onmessage = function(event) {{
+                    try {{
+                        const data = JSON.parse(event.data);
+                        const imageUrls = extractImageUrlsFromJson(data);
+                        imageUrls.forEach(url => window.networkCapture.imageUrls.add(url));
+    
+                        if (imageUrls.length > 0) {{
+                            window.networkCapture.websocketMessages.push({{
+                                url: url,
+                                data: data,
+                                imageUrls: imageUrls
+                            }});
+                        }}
+                    }} catch (e) {{
+                        // Не JSON данные, игнорируем
+                    }}
+    
+                    if (originalOnMessage) {{
+                        originalOnMessage.call(this, event);
+                    }}
+                }};
+    
+                return ws;
+            }};
+        }}
+    
+        console.log('Network traffic capture initialized');
+    }}
+    """
+
+
+@lru_cache(maxsize=16)
+def _build_hidden_extraction_script(cfg: Tuple[Tuple[str, Any], ...]) -> str:
+    """JavaScript для извлечения скрытых изображений"""
+    return f"""
+    async () => {{
+        {_config_header(dict(cfg))}
+        {_EXTRACT_SRC_SCRIPT}
+        const hiddenImages = {{
+            base64Images: [],
+            canvasImages: [],
+            webglImages: [],
+            shadowDomImages: []
+        }};
+    
+        // Извлечение base64 изображений
+        if (CFG.extractBase64) {{
+            // Из data-URI в HTML
+            document.querySelectorAll('[src^="data:image"], [data-src^="data:image"]').forEach(img => {{
+                const src = img.src || img.dataset.src;
+                if (src && src.startsWith('data:image')) {{
+                    hiddenImages.base64Images.push(src);
+                }}
+            }});
+    
+            // Из CSS background-image
+            document.querySelectorAll('*').forEach(el => {{
+                const style = window.getComputedStyle(el);
+                const bgImage = style.backgroundImage;
+                if (bgImage && bgImage.includes('data:image')) {{
+                    const match = bgImage.match(/url\\(["']?(data:image[^"')]+)["']?\\)/);
+                    if (match) {{
+                        hiddenImages.base64Images.push(match[1]);
+                    }}
+                }}
+            }});
+        }}
+    
+        // Тип контекста canvas фиксируется при первом getContext — определяем
+        // его один раз и кэшируем на элементе, чтобы не создавать лишних контекстов
+        const canvasKind = (canvas) => canvas.__scKind || (canvas.__scKind = (() => {{
+            try {{
+                if (canvas.getContext('2d')) return '2d';
+                return (canvas.getContext('webgl') || canvas.getContext('experimental-webgl')) ? 'gl' : 'none';
+            }} catch (e) {{
+                return 'none';
+            }}
+        }})());
+    
+        // Асинхронное кодирование canvas в WebP blob URL: не блокирует главный
+        // поток и в разы меньше PNG в base64
+        const pending = [];
+        const encodeCanvas = (canvas) => new Promise(resolve => {{
+            try {{
+                canvas.toBlob(blob => resolve(blob ? URL.createObjectURL(blob) : null), 'image/webp', 0.8);
+            }} catch (e) {{
+                resolve(null);
+            }}
+        }});
+    
+        // Извлечение из Canvas
+        if (CFG.extractCanvas) {{
+            document.querySelectorAll('canvas').forEach(canvas => {{
+                try {{
+                    if (canvasKind(canvas) !== '2d') return;
+    
+                    // Пропускаем шум и слишком большие canvas (риск OOM)
+                    const area = canvas.width * canvas.height;
+                    if (area < 64 || area > 16777216) return;
+    
+                    // Проверяем, есть ли что-то нарисованное, по выборке 32x32
+                    // вместо чтения всего буфера
+                    const ctx = canvas.getContext('2d');
+                    const sw = Math.min(32, canvas.width);
+                    const sh = Math.min(32, canvas.height);
+                    const data = ctx.getImageData(0, 0, sw, sh).data;
+    
+                    // Проверяем, не пустой ли canvas
+                    let hasContent = false;
+                    for (let i = 0; i < data.length; i += 4) {{
+                        if (data[i] !== 0 || data[i+1] !== 0 || data[i+2] !== 0 || data[i+3] !== 0) {{
+                            hasContent = true;
+                            break;
+                        }}
+                    }}
+    
+                    if (hasContent) {{
+                        pending.push(encodeCanvas(canvas).then(blobURL => {{
+                            if (!blobURL) return;
+                            hiddenImages.canvasImages.push({{
+                                blobURL: blobURL,
+                                width: canvas.width,
+                                height: canvas.height,
+                                element: canvas.outerHTML.substring(0, 100) + '...'
+                            }});
+                        }}));
+                    }}
+                }} catch (e) {{
+                    console.debug('Canvas extraction error:', e);
+                }}
+            }});
+        }}
+    
+        // Извлечение из WebGL (базовая поддержка)
+        if (CFG.extractWebgl) {{
+            document.querySelectorAll('canvas').forEach(canvas => {{
+                try {{
+                    if (canvasKind(canvas) !== 'gl') return;
+                    const gl = canvas.getContext('webgl') || canvas.getContext('experimental-webgl');
+                    if (gl && !gl.isContextLost()) {{
+                        // Без preserveDrawingBuffer буфер уже очищен - копия будет пустой
+                        const attrs = gl.getContextAttributes();
+                        if (!attrs || !attrs.preserveDrawingBuffer) return;
+                        
+                        // Создаем offscreen canvas для рендеринга
+                        const offscreen = document.createElement('canvas');
+                        offscreen.width = canvas.width;
+                        offscreen.height = canvas.height;
+                        const ctx = offscreen.getContext('2d');
+    
+                        // Копируем WebGL контент (упрощенный подход)
+                        ctx.drawImage(canvas, 0, 0);
+                        pending.push(encodeCanvas(offscreen).then(blobURL => {{
+                            if (!blobURL) return;
+                            hiddenImages.webglImages.push({{
+                                blobURL: blobURL,
+                                width: canvas.width,
+                                height: canvas.height
+                            }});
+                        }}));
+                    }}
+                }} catch (e) {{
+                    console.debug('WebGL extraction error:', e);
+                }}
+            }});
+        }}
+    
+        // Извлечение из Shadow DOM
+        if (CFG.extractShadowDom) {{
+            const walkShadowDOM = (element) => {{
+                if (element.shadowRoot) {{
+                    // Поиск изображений в shadow root
+                    element.shadowRoot.querySelectorAll('img, [data-src], [style*="background-image"]').forEach(img => {{
+                        const src = window.__scExtractSrc(img);
+                        if (src) {{
+                            hiddenImages.shadowDomImages.push(src);
+                        }}
+    
+                        // CSS background images
+                        const style = window.getComputedStyle(img);
+                        const bgImage = style.backgroundImage;
+                        if (bgImage && bgImage !== 'none') {{
+                            const match = bgImage.match(/url\\(["']?([^"')]+)["']?\\)/);
+                            if (match) {{
+                                hiddenImages.shadowDomImages.push(match[1]);
+                            }}
+                        }}
+                    }});
+                }}
+    
+                // Рекурсивно обходим дочерние элементы
+                Array.from(element.children).forEach(walkShadowDOM);
+            }};
+    
+            walkShadowDOM(document.body);
+        }}
+    
+        await Promise.all(pending);
+        return hiddenImages;
+    }}
+    """
+
+
+
 class HumanEmulator:
     """Эмулятор человеческого поведения для глубокого извлечения изображений"""
     
@@ -20,6 +550,13 @@ class HumanEmulator:
         self.max_interactions = self.config.get('max_interactions', 50)
         self.scroll_pause_time = self.config.get('scroll_pause_time', 2.0)
         self.max_scroll_attempts = self.config.get('max_scroll_attempts', 10)
+        self.dom_stabilization_timeout = config.get('crawling', {}).get('timeouts', {}).get('dom_stabilization_timeout', 3000)
+        
+        script_config = _freeze(self._get_script_config())
+        self._scripts = {
+            'emulation': _build_emulation_script(script_config),
+            'interaction': _build_interaction_script(script_config),
+        }
         
     def get_human_emulation_methods(self) -> List[PageMethod]:
         """Возвращает методы для эмуляции человеческого поведения"""
@@ -34,185 +571,37 @@ class HumanEmulator:
             PageMethod('evaluate', self._get_interaction_script()),
             
             # Ожидание стабилизации DOM
-            PageMethod('wait_for_timeout', self.config.get('crawling', {}).get('timeouts', {}).get('dom_stabilization_timeout', 3000)),
+            PageMethod('wait_for_timeout', self.dom_stabilization_timeout),
             
             # Финальный сбор данных
             PageMethod('evaluate', self._get_collection_script()),
         ]
     
+    def _get_script_config(self) -> Dict[str, Any]:
+        """Конфигурация эмуляции для вставки в JavaScript"""
+        return {
+            'maxInteractions': int(self.max_interactions),
+            'maxScrollAttempts': int(self.max_scroll_attempts),
+            'scrollSpeed': float(self.scroll_speed),
+            'clickDelayMin': float(self.click_delay[0]),
+            'clickDelayMax': float(self.click_delay[1]),
+            'scrollPauseMs': int(self.scroll_pause_time * 1000),
+        }
+    
     def _get_emulation_script(self) -> str:
         """JavaScript для инициализации эмуляции человеческого поведения"""
-        return f"""
-        () => {{
-            // Глобальные переменные для эмуляции
-            window.humanEmulation = {{
-                discoveredImages: new Set(),
-                interactions: 0,
-                maxInteractions: {self.max_interactions},
-                scrollAttempts: 0,
-                maxScrollAttempts: {self.max_scroll_attempts},
-                lastScrollHeight: 0,
-                isScrolling: false
-            }};
-            
-            // Функция для случайной задержки
-            window.randomDelay = (min, max) => {{
-                return new Promise(resolve => {{
-                    const delay = Math.random() * (max - min) + min;
-                    setTimeout(resolve, delay * 1000);
-                }});
-            }};
-            
-            // Функция для эмуляции движения мыши
-            window.simulateMouseMovement = () => {{
-                const event = new MouseEvent('mousemove', {{
-                    clientX: Math.random() * window.innerWidth,
-                    clientY: Math.random() * window.innerHeight,
-                    bubbles: true
-                }});
-                document.dispatchEvent(event);
-            }};
-            
-            // Мониторинг мутаций DOM для обнаружения новых изображений
-            const observer = new MutationObserver(mutations => {{
-                mutations.forEach(mutation => {{
-                    if (mutation.type === 'childList') {{
-                        mutation.addedNodes.forEach(node => {{
-                            if (node.nodeType === Node.ELEMENT_NODE) {{
-                                // Проверяем img теги
-                                const images = node.tagName === 'IMG' ? [node] : node.querySelectorAll('img');
-                                images.forEach(img => {{
-                                    const src = img.src || img.dataset.src || 
-                                              (img.style.backgroundImage && img.style.backgroundImage.match(/url\\(["']?([^"')]+)["']?\\)/)?.[1]);
-                                    if (src) window.humanEmulation.discoveredImages.add(src);
-                                }});
-                            }}
-                        }});
-                    }});
-                }});
-            }});
-            
-            observer.observe(document.body, {{
-                childList: true,
-                subtree: true,
-                attributes: true,
-                attributeFilter: ['src', 'data-src', 'style']
-            }});
-            
-            console.log('Human emulation initialized');
-        }}
-        """
+        return self._scripts['emulation']
     
     def _get_interaction_script(self) -> str:
         """JavaScript для выполнения человеческих взаимодействий"""
-        return f"""
-        async () => {{
-            const emulation = window.humanEmulation;
-            
-            // Функция для плавного скролла
-            const smoothScroll = async (distance) => {{
-                const startY = window.pageYOffset;
-                const targetY = startY + distance;
-                const duration = Math.abs(distance) / {self.scroll_speed} * 1000;
-                const startTime = performance.now();
-                
-                return new Promise(resolve => {{
-                    const scroll = (currentTime) => {{
-                        const elapsed = currentTime - startTime;
-                        const progress = Math.min(elapsed / duration, 1);
-                        
-                        // Easing function для естественного скролла
-                        const easeProgress = progress < 0.5 
-                            ? 2 * progress * progress 
-                            : 1 - Math.pow(-2 * progress + 2, 3) / 2;
-                        
-                        window.scrollTo(0, startY + (targetY - startY) * easeProgress);
-                        
-                        if (progress < 1) {{
-                            requestAnimationFrame(scroll);
-                        }} else {{
-                            resolve();
-                        }}
-                    }};
-                    requestAnimationFrame(scroll);
-                }});
-            }};
-            
-            // Основной цикл взаимодействий
-            while (emulation.interactions < emulation.maxInteractions && 
-                   emulation.scrollAttempts < emulation.maxScrollAttempts) {{
-                
-                const currentHeight = document.documentElement.scrollHeight;
-                
-                // Если высота не изменилась несколько раз подряд - прекращаем
-                if (currentHeight === emulation.lastScrollHeight) {{
-                    emulation.scrollAttempts++;
-                }} else {{
-                    emulation.scrollAttempts = 0;
-                    emulation.lastScrollHeight = currentHeight;
-                }}
-                
-                // Случайное движение мыши
-                window.simulateMouseMovement();
-                
-                // Поиск и клик по кнопкам "Load More"
-                const loadMoreButtons = document.querySelectorAll(
-                    'button:contains("Load"), button:contains("More"), ' +
-                    'a:contains("Next"), [data-load], [data-more], ' +
-                    '.load-more, .show-more, .pagination-next'
-                );
-                
-                if (loadMoreButtons.length > 0 && Math.random() < 0.3) {{
-                    const button = loadMoreButtons[Math.floor(Math.random() * loadMoreButtons.length)];
-                    if (button.offsetParent !== null) {{ // видимая кнопка
-                        // Скролл к кнопке
-                        button.scrollIntoView({{ behavior: 'smooth', block: 'center' }});
-                        await window.randomDelay(1, 2);
-                        
-                        // Hover эффект
-                        button.dispatchEvent(new MouseEvent('mouseenter', {{ bubbles: true }}));
-                        await window.randomDelay(0.5, 1);
-                        
-                        // Клик
-                        button.click();
-                        await window.randomDelay({self.click_delay[0]}, {self.click_delay[1]});
-                        
-                        emulation.interactions++;
-                        continue;
-                    }}
-                }}
-                
-                // Скролл вниз
-                const scrollDistance = Math.random() * 800 + 400; // 400-1200px
-                await smoothScroll(scrollDistance);
-                
-                // Пауза для загрузки контента
-                await window.randomDelay({self.scroll_pause_time * 0.5}, {self.scroll_pause_time * 1.5});
-                
-                // Проверка на infinite scroll
-                const isNearBottom = (window.innerHeight + window.pageYOffset) >= 
-                                   document.documentElement.scrollHeight - 1000;
-                
-                if (isNearBottom) {{
-                    // Дополнительная пауза для lazy loading
-                    await window.randomDelay(2, 4);
-                }}
-                
-                emulation.interactions++;
-            }}
-            
-            // Финальный скролл вверх для активации lazy loading
-            await smoothScroll(-window.pageYOffset / 2);
-            await window.randomDelay(1, 2);
-            
-            console.log('Human emulation completed: ' + emulation.interactions + ' interactions, ' + emulation.discoveredImages.size + ' images discovered');
-        }}
-        """
+        return self._scripts['interaction']
+    
+    
     
     def _get_collection_script(self) -> str:
         """JavaScript для сбора обнаруженных изображений"""
         return """
-        () => {
+        async () => {""" + _EXTRACT_SRC_SCRIPT + """
             // Собираем все обнаруженные изображения
             const discoveredImages = Array.from(window.humanEmulation.discoveredImages);
             
@@ -222,8 +611,7 @@ class HumanEmulator:
                 if (element.shadowRoot) {
                     const shadowImgs = element.shadowRoot.querySelectorAll('img, [data-src], [style*="background-image"]');
                     shadowImgs.forEach(img => {
-                        const src = img.src || img.dataset.src || 
-                                  (img.style.backgroundImage && img.style.backgroundImage.match(/url\\(["']?([^"')]+)["']?\\)/)?.[1]);
+                        const src = window.__scExtractSrc(img);
                         if (src) shadowImages.push(src);
                     });
                 }
@@ -232,18 +620,23 @@ class HumanEmulator:
             };
             walkShadowDOM(document.body);
             
-            // Поиск canvas элементов
+            // Поиск canvas элементов: асинхронное WebP-кодирование в blob URL
+            // не блокирует главный поток, в отличие от toDataURL('image/png')
             const canvasImages = [];
+            const pending = [];
             document.querySelectorAll('canvas').forEach(canvas => {
-                try {
-                    const dataURL = canvas.toDataURL('image/png');
-                    if (dataURL && dataURL !== 'data:,') {
-                        canvasImages.push(dataURL);
+                pending.push(new Promise(resolve => {
+                    try {
+                        canvas.toBlob(blob => resolve(blob ? URL.createObjectURL(blob) : null), 'image/webp', 0.8);
+                    } catch (e) {
+                        // Игнорируем CORS ошибки
+                        resolve(null);
                     }
-                } catch (e) {
-                    // Игнорируем CORS ошибки
-                }
+                }).then(url => {
+                    if (url) canvasImages.push(url);
+                }));
             });
+            await Promise.all(pending);
             
             return {
                 discoveredImages: discoveredImages,
@@ -270,6 +663,10 @@ class NetworkTrafficCapture:
         self.capture_websockets = self.config.get('capture_websockets', False)
         self.image_domains = self.config.get('image_domains', [])
         
+        self._scripts = {
+            'setup': _build_network_setup_script(_freeze(self._get_script_config())),
+        }
+        
     def get_network_capture_methods(self) -> List[PageMethod]:
         """Возвращает методы для захвата сетевого трафика"""
         if not self.enabled:
@@ -279,110 +676,31 @@ class NetworkTrafficCapture:
             PageMethod('evaluate', self._get_network_setup_script()),
         ]
     
+    def _get_script_config(self) -> Dict[str, Any]:
+        """Конфигурация захвата для вставки в JavaScript"""
+        return {
+            'captureJson': bool(self.capture_json),
+            'captureWebsockets': bool(self.capture_websockets),
+        }
+    
     def _get_network_setup_script(self) -> str:
         """JavaScript для настройки захвата сетевого трафика"""
-        return f"""
-        () => {{
-            window.networkCapture = {{
-                imageUrls: new Set(),
-                apiResponses: [],
-                websocketMessages: []
-            }};
-            
-            // Перехват fetch запросов
-            const originalFetch = window.fetch;
-            window.fetch = async function(...args) {{
-                const response = await originalFetch.apply(this, args);
-                
-                // Клонируем response для анализа
-                const clonedResponse = response.clone();
-                
-                try {{
-                    const contentType = response.headers.get('content-type') || '';
-                    
-                    // Если это изображение
-                    if (contentType.startsWith('image/')) {{
-                        window.networkCapture.imageUrls.add(response.url);
-                    }}
-                    
-                    // Если это JSON - ищем URL изображений
-                    if (contentType.includes('application/json') && {str(self.capture_json).lower()}) {{
-                        const jsonData = await clonedResponse.json();
-                        const imageUrls = extractImageUrlsFromJson(jsonData);
-                        imageUrls.forEach(url => window.networkCapture.imageUrls.add(url));
-                        
-                        window.networkCapture.apiResponses.push({{
-                            url: response.url,
-                            data: jsonData,
-                            imageUrls: imageUrls
-                        }});
-                    }}
-                }} catch (e) {{
-                    console.debug('Network capture error:', e);
-                }}
-                
-                return response;
-            }};
-            
-            // Функция для извлечения URL из JSON
-            function extractImageUrlsFromJson(obj, urls = []) {{
-                if (typeof obj === 'string') {{
-                    // Проверяем на URL изображения
-                    if (/\\.(jpg|jpeg|png|gif|webp|avif|svg|bmp|tiff)($|\\?)/i.test(obj) ||
-                        /^https?:\\/\\/.*\\/(image|img|photo|picture)/i.test(obj)) {{
-                        urls.push(obj);
-                    }}
-                }} else if (Array.isArray(obj)) {{
-                    obj.forEach(item => extractImageUrlsFromJson(item, urls));
-                }} else if (obj && typeof obj === 'object') {{
-                    Object.keys(obj).forEach(key => {{
-                        // Ключи, которые часто содержат изображения
-                        if (/^(image|img|photo|picture|thumbnail|avatar|banner|background)$/i.test(key)) {{
-                            if (typeof obj[key] === 'string') {{
-                                urls.push(obj[key]);
-                            }}
-                        }}
-                        extractImageUrlsFromJson(obj[key], urls);
-                    }});
-                }}
-                return urls;
-            }}
-            
-            // WebSocket перехват (если включен)
-            if ({str(self.capture_websockets).lower()}) {{
-                const originalWebSocket = window.WebSocket;
-                window.WebSocket = function(url, protocols) {{
-                    const ws = new originalWebSocket(url, protocols);
-                    
-                    const originalOnMessage = ws.onmessage;
-                    ws.onmessage = function(event) {{
-                        try {{
-                            const data = JSON.parse(event.data);
-                            const imageUrls = extractImageUrlsFromJson(data);
-                            imageUrls.forEach(url => window.networkCapture.imageUrls.add(url));
-                            
-                            if (imageUrls.length > 0) {{
-                                window.networkCapture.websocketMessages.push({{
-                                    url: url,
-                                    data: data,
-                                    imageUrls: imageUrls
-                                }});
-                            }}
-                        }} catch (e) {{
-                            // Не JSON данные, игнорируем
-                        }}
-                        
-                        if (originalOnMessage) {{
-                            originalOnMessage.call(this, event);
-                        }}
-                    }};
-                    
-                    return ws;
-                }};
-            }}
+        return self._scripts['setup']
+    
+    
+    def _get_network_collection_script(self) -> str:
+        """JavaScript для сбора данных сетевого трафика"""
+        return """
+        () => {
+            const capturedData = window.networkCapture;
+            if (!capturedData) return null;
             
-            console.log('Network traffic capture initialized');
-        }}
+            return {
+                imageUrls: Array.from(capturedData.imageUrls),
+                apiResponses: capturedData.apiResponses,
+                websocketMessages: capturedData.websocketMessages
+            };
+        }
         """
 
 
@@ -397,6 +715,18 @@ class HiddenImageExtractor:
         self.extract_webgl = self.config.get('extract_webgl', False)
         self.extract_shadow_dom = self.config.get('extract_shadow_dom', True)
         
+        self._scripts = {
+            'extraction': _build_hidden_extraction_script(_freeze(self._get_script_config())),
+        }
+        
+    async def fetch_blob(self, page, blob_url: str) -> bytes:
+        """Загружает содержимое blob URL, созданного скриптом извлечения"""
+        data = await page.evaluate(
+            "url => fetch(url).then(r => r.arrayBuffer()).then(b => Array.from(new Uint8Array(b)))",
+            blob_url
+        )
+        return bytes(data)
+    
     def get_hidden_extraction_methods(self) -> List[PageMethod]:
         """Возвращает методы для извлечения скрытых изображений"""
         if not self.enabled:
@@ -406,131 +736,61 @@ class HiddenImageExtractor:
             PageMethod('evaluate', self._get_hidden_extraction_script()),
         ]
     
+    def _get_script_config(self) -> Dict[str, Any]:
+        """Конфигурация извлечения для вставки в JavaScript"""
+        return {
+            'extractBase64': bool(self.extract_base64),
+            'extractCanvas': bool(self.extract_canvas),
+            'extractWebgl': bool(self.extract_webgl),
+            'extractShadowDom': bool(self.extract_shadow_dom),
+        }
+    
     def _get_hidden_extraction_script(self) -> str:
         """JavaScript для извлечения скрытых изображений"""
-        return f"""
-        () => {{
-            const hiddenImages = {{
-                base64Images: [],
-                canvasImages: [],
-                webglImages: [],
-                shadowDomImages: []
-            }};
-            
-            // Извлечение base64 изображений
-            if ({str(self.extract_base64).lower()}) {{
-                // Из data-URI в HTML
-                document.querySelectorAll('[src^="data:image"], [data-src^="data:image"]').forEach(img => {{
-                    const src = img.src || img.dataset.src;
-                    if (src && src.startsWith('data:image')) {{
-                        hiddenImages.base64Images.push(src);
-                    }}
-                }});
-                
-                // Из CSS background-image
-                document.querySelectorAll('*').forEach(el => {{
-                    const style = window.getComputedStyle(el);
-                    const bgImage = style.backgroundImage;
-                    if (bgImage && bgImage.includes('data:image')) {{
-                        const match = bgImage.match(/url\\(["']?(data:image[^"')]+)["']?\\)/);
-                        if (match) {{
-                            hiddenImages.base64Images.push(match[1]);
-                        }}
-                    }}
-                }});
-            }}
-            
-            // Извлечение из Canvas
-            if ({str(self.extract_canvas).lower()}) {{
-                document.querySelectorAll('canvas').forEach(canvas => {{
-                    try {{
-                        // Проверяем, есть ли что-то нарисованное
-                        const ctx = canvas.getContext('2d');
-                        const imageData = ctx.getImageData(0, 0, canvas.width, canvas.height);
-                        const data = imageData.data;
-                        
-                        // Проверяем, не пустой ли canvas
-                        let hasContent = false;
-                        for (let i = 0; i < data.length; i += 4) {{
-                            if (data[i] !== 0 || data[i+1] !== 0 || data[i+2] !== 0 || data[i+3] !== 0) {{
-                                hasContent = true;
-                                break;
-                            }}
-                        }}
-                        
-                        if (hasContent) {{
-                            const dataURL = canvas.toDataURL('image/png');
-                            hiddenImages.canvasImages.push({{
-                                dataURL: dataURL,
-                                width: canvas.width,
-                                height: canvas.height,
-                                element: canvas.outerHTML.substring(0, 100) + '...'
-                            }});
-                        }}
-                    }} catch (e) {{
-                        console.debug('Canvas extraction error:', e);
-                    }}
-                }});
-            }}
-            
-            // Извлечение из WebGL (базовая поддержка)
-            if ({str(self.extract_webgl).lower()}) {{
-                document.querySelectorAll('canvas').forEach(canvas => {{
-                    try {{
-                        const gl = canvas.getContext('webgl') || canvas.getContext('experimental-webgl');
-                        if (gl) {{
-                            // Создаем offscreen canvas для рендеринга
-                            const offscreen = document.createElement('canvas');
-                            offscreen.width = canvas.width;
-                            offscreen.height = canvas.height;
-                            const ctx = offscreen.getContext('2d');
-                            
-                            // Копируем WebGL контент (упрощенный подход)
-                            ctx.drawImage(canvas, 0, 0);
-                            const dataURL = offscreen.toDataURL('image/png');
-                            
-                            hiddenImages.webglImages.push({{
-                                dataURL: dataURL,
-                                width: canvas.width,
-                                height: canvas.height
-                            }});
-                        }}
-                    }} catch (e) {{
-                        console.debug('WebGL extraction error:', e);
-                    }}
-                }});
-            }}
-            
-            // Извлечение из Shadow DOM
-            if ({str(self.extract_shadow_dom).lower()}) {{
-                const walkShadowDOM = (element) => {{
-                    if (element.shadowRoot) {{
-                        // Поиск изображений в shadow root
-                        element.shadowRoot.querySelectorAll('img, [data-src], [style*="background-image"]').forEach(img => {{
-                            const src = img.src || img.dataset.src;
-                            if (src) {{
-                                hiddenImages.shadowDomImages.push(src);
-                            }}
-                            
-                            // CSS background images
-                            const style = window.getComputedStyle(img);
-                            const bgImage = style.backgroundImage;
-                            if (bgImage && bgImage !== 'none') {{
-                                const match = bgImage.match(/url\\(["']?([^"')]+)["']?\\)/);
-                                if (match) {{
-                                    hiddenImages.shadowDomImages.push(match[1]);
-                                }}
-                            }}
-                        }});
-                    }}
-                    
-                    // Рекурсивно обходим дочерние элементы
-                    Array.from(element.children).forEach(walkShadowDOM);
-                }};
-                
-                walkShadowDOM(document.body);
-            }}
-            
-            return hiddenImages;
+        return self._scripts['extraction']
+    
+
+
+def build_combined_setup(emu: HumanEmulator, net: NetworkTrafficCapture,
+                         hidden: HiddenImageExtractor) -> List[PageMethod]:
+    """Собирает скрипты трёх модулей в три PageMethod вместо шести и более
+
+    Каждый evaluate — отдельный CDP round-trip, поэтому скрипты объединяются:
+    общая инициализация -> взаимодействия с ожиданием -> общий сбор данных,
+    который возвращает {human: ..., network: ..., hidden: ...}.
+    """
+    setup_parts = []
+    collection_parts = []
+    
+    if emu.enabled:
+        setup_parts.append(f"({emu._get_emulation_script()})();")
+        collection_parts.append(f"result.human = await ({emu._get_collection_script()})();")
+    if net.enabled:
+        setup_parts.append(f"({net._get_network_setup_script()})();")
+        collection_parts.append(f"result.network = ({net._get_network_collection_script()})();")
+    if hidden.enabled:
+        collection_parts.append(f"result.hidden = await ({hidden._get_hidden_extraction_script()})();")
+    
+    if not setup_parts and not collection_parts:
+        return []
+    
+    methods = [
+        PageMethod('evaluate', "() => {\n" + "\n".join(setup_parts) + "\n}"),
+    ]
+    
+    if emu.enabled:
+        methods.append(PageMethod('evaluate', f"""
+        async () => {{
+            await ({emu._get_interaction_script()})();
+            await new Promise(resolve => setTimeout(resolve, {int(emu.dom_stabilization_timeout)}));
         }}
-        """
+        """))
+    
+    methods.append(PageMethod('evaluate', (
+        "async () => {\n"
+        "const result = {human: null, network: null, hidden: null};\n"
+        + "\n".join(collection_parts)
+        + "\nreturn result;\n}"
+    )))
+    
+    return methods
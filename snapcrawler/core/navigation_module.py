@@ -5,18 +5,93 @@
 import re
 import json
 import asyncio
+import hashlib
+import heapq
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Set, Optional, Tuple, Any
+from io import BytesIO
+from typing import List, Dict, Set, Optional, Tuple, Any, Iterator
 from urllib.parse import urljoin, urlparse, parse_qs
 from dataclasses import dataclass
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from string import Template
+import numpy as np
 from scrapy.http import Request
+from parsel.csstranslator import HTMLTranslator
+from lxml import etree
 from scrapy_playwright.page import PageMethod
 import logging
 
+try:
+    import ahocorasick
+except ImportError:  # Опционально: без pyahocorasick работает объединённое регулярное выражение
+    ahocorasick = None
+
+try:
+    from numba import njit
+except ImportError:  # Опционально: без numba ядро оценки ссылок работает на numpy
+    njit = None
+
 logger = logging.getLogger(__name__)
 
+_SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+_translator = HTMLTranslator()
+
+# Элементы без закрывающего тега: в разметке дают один '<', а не два
+_VOID_TAGS = frozenset({
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+})
+
+
+def _first_text(element) -> str:
+    """Первый текстовый узел элемента — то же, что ::text .get() в parsel"""
+    if element.text is not None:
+        return element.text
+    for child in element:
+        if child.tail is not None:
+            return child.tail
+    return ''
+
+
+def _url_hash(url: str) -> int:
+    """64-битный хэш URL для дедупликации: 8 байт вместо всей строки"""
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), 'little')
+
+
+@lru_cache(maxsize=512)
+def _css_to_xpath(selector: str) -> str:
+    """Переводит CSS-селектор в XPath один раз на всё время работы"""
+    return _translator.css_to_xpath(selector)
+
 
-@dataclass
+@lru_cache(maxsize=64)
+def _fused_url_regex(alternatives: Tuple[Tuple[str, str], ...]) -> 're.Pattern':
+    """Одно регулярное выражение-объединение с именованной группой на каждый паттерн"""
+    return re.compile(
+        '|'.join(f'(?P<{name}>{pattern})' for name, pattern in alternatives),
+        re.IGNORECASE
+    )
+
+
+def _score_links(href_hits, text_hits, image_hits):
+    """Релевантность ссылок по матрицам совпадений категорий (ссылка × категория)
+    
+    Каждая категория в URL даёт 0.3, в тексте ссылки — 0.4, индикатор
+    изображения — 0.3; итог ограничен единицей.
+    """
+    relevance = href_hits.sum(axis=1) * 0.3 + text_hits.sum(axis=1) * 0.4 + image_hits * 0.3
+    return np.minimum(relevance, 1.0)
+
+
+if njit is not None:
+    _score_links = njit(cache=True)(_score_links)
+
+
+@dataclass(slots=True)
 class NavigationPattern:
     """Паттерн навигации для автоматического обнаружения"""
     pattern_type: str  # 'pagination', 'infinite_scroll', 'load_more', 'sitemap'
@@ -95,53 +170,96 @@ class PaginationDetector:
                 metadata={'max_clicks': 50}
             )
         ]
+        
+        # URL-паттерны всех типов объединяются в одно выражение: текст
+        # страницы просматривается один раз вместо прохода на каждый паттерн
+        self._url_group_names: Dict[int, List[str]] = {}
+        alternatives = []
+        for i, p in enumerate(self.pagination_patterns):
+            names = [f'p{i}_{j}' for j in range(len(p.url_patterns))]
+            self._url_group_names[id(p)] = names
+            alternatives.extend(zip(names, p.url_patterns))
+        self._url_alternatives: Tuple[Tuple[str, str], ...] = tuple(alternatives)
+        
+        # Текстовые селекторы :contains() компилируются в lxml XPath заранее
+        # и вычисляются прямо на дереве ответа
+        self._compiled_contains_selectors: Dict[int, Dict[str, etree.XPath]] = {
+            id(p): {
+                selector: etree.XPath(_css_to_xpath(selector))
+                for selector in p.selectors if ':contains(' in selector
+            }
+            for p in self.pagination_patterns
+        }
     
-    def detect_navigation_patterns(self, response) -> List[NavigationPattern]:
-        """Обнаруживает паттерны навигации на странице"""
-        detected_patterns = []
+    def detect_navigation_patterns(self, response, top_n: int = 2) -> List[Tuple[float, NavigationPattern]]:
+        """Обнаруживает паттерны навигации на странице
+        
+        Возвращает до top_n пар (уверенность, паттерн) по убыванию уверенности;
+        сами паттерны не копируются.
+        """
+        # Текст страницы сканируется, только если хотя бы одному паттерну
+        # URL-совпадения ещё могут дать уверенность выше порога
+        url_hits = None
         
+        detected = []
         for pattern in self.pagination_patterns:
-            confidence = self._calculate_pattern_confidence(response, pattern)
+            selector_score = self._selector_score(response, pattern)
+            # Даже полное совпадение URL-паттернов (вес 0.4) не поднимет оценку выше 0.5
+            if selector_score + 0.4 <= 0.5:
+                continue
+            if url_hits is None:
+                url_hits = self._scan_url_patterns(response.text)
+            confidence = min(selector_score + self._url_score(pattern, url_hits), 1.0)
             if confidence > 0.5:
-                detected_pattern = NavigationPattern(
-                    pattern_type=pattern.pattern_type,
-                    selectors=pattern.selectors,
-                    url_patterns=pattern.url_patterns,
-                    confidence=confidence,
-                    metadata=pattern.metadata
-                )
-                detected_patterns.append(detected_pattern)
+                detected.append((confidence, pattern))
         
-        return sorted(detected_patterns, key=lambda x: x.confidence, reverse=True)
+        return heapq.nlargest(top_n, detected, key=lambda item: item[0])
     
-    def _calculate_pattern_confidence(self, response, pattern: NavigationPattern) -> float:
-        """Вычисляет уверенность в паттерне навигации"""
-        confidence = 0.0
-        
-        # Проверяем селекторы
+    def _scan_url_patterns(self, page_text: str) -> Set[str]:
+        """Возвращает имена групп URL-паттернов, найденных в тексте страницы
+
+        Ищется самое левое совпадение среди ещё не найденных паттернов;
+        найденный паттерн исключается, и поиск повторяется. Так совпадения
+        разных паттернов не перекрывают друг друга, а проходов по тексту
+        столько, сколько найдено паттернов, плюс один.
+        """
+        hits = set()
+        remaining = self._url_alternatives
+        while remaining:
+            match = _fused_url_regex(remaining).search(page_text)
+            if match is None:
+                break
+            hits.add(match.lastgroup)
+            remaining = tuple(item for item in remaining if item[0] != match.lastgroup)
+        return hits
+    
+    def _selector_score(self, response, pattern: NavigationPattern) -> float:
+        """Вклад селекторов в уверенность (вес 0.6)"""
         selector_matches = 0
+        contains_selectors = self._compiled_contains_selectors.get(id(pattern), {})
         for selector in pattern.selectors:
             try:
-                elements = response.css(selector)
+                compiled = contains_selectors.get(selector)
+                if compiled is not None:
+                    elements = compiled(response.selector.root)
+                else:
+                    elements = response.xpath(_css_to_xpath(selector))
                 if elements:
                     selector_matches += 1
             except:
                 continue
         
         if selector_matches > 0:
-            confidence += (selector_matches / len(pattern.selectors)) * 0.6
-        
-        # Проверяем URL паттерны
-        url_matches = 0
-        page_text = response.text.lower()
-        for url_pattern in pattern.url_patterns:
-            if re.search(url_pattern, page_text, re.IGNORECASE):
-                url_matches += 1
+            return (selector_matches / len(pattern.selectors)) * 0.6
+        return 0.0
+    
+    def _url_score(self, pattern: NavigationPattern, url_hits: Set[str]) -> float:
+        """Вклад URL-паттернов в уверенность (вес 0.4)"""
+        url_matches = sum(1 for name in self._url_group_names[id(pattern)] if name in url_hits)
         
         if url_matches > 0:
-            confidence += (url_matches / len(pattern.url_patterns)) * 0.4
-        
-        return min(confidence, 1.0)
+            return (url_matches / len(pattern.url_patterns)) * 0.4
+        return 0.0
 
 
 class SitemapParser:
@@ -166,47 +284,57 @@ class SitemapParser:
         
         return discovered_sitemaps
     
-    def parse_sitemap(self, response) -> List[Dict[str, Any]]:
-        """Парсит XML sitemap"""
-        urls = []
+    def parse_sitemap(self, response) -> Iterator[Dict[str, Any]]:
+        """Потоково парсит XML sitemap, отдавая записи по мере чтения"""
+        root_kind = None
+        root = None
         
         try:
-            # Пытаемся парсить как XML
-            root = ET.fromstring(response.body)
-            
-            # Обрабатываем sitemap index
-            if 'sitemapindex' in root.tag:
-                for sitemap in root.findall('.//{http://www.sitemaps.org/schemas/sitemap/0.9}sitemap'):
-                    loc = sitemap.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc')
+            # iterparse не строит всё дерево: обработанные записи сразу удаляются
+            for event, elem in ET.iterparse(BytesIO(response.body), events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                        if 'sitemapindex' in elem.tag:
+                            root_kind = 'sitemapindex'
+                        elif 'urlset' in elem.tag:
+                            root_kind = 'urlset'
+                    continue
+                
+                # Обрабатываем sitemap index
+                if root_kind == 'sitemapindex' and elem.tag == _SITEMAP_NS + 'sitemap':
+                    loc = elem.find(_SITEMAP_NS + 'loc')
                     if loc is not None:
-                        urls.append({
+                        yield {
                             'url': loc.text,
                             'type': 'sitemap',
                             'priority': 1.0
-                        })
-            
-            # Обрабатываем обычный sitemap
-            elif 'urlset' in root.tag:
-                for url_elem in root.findall('.//{http://www.sitemaps.org/schemas/sitemap/0.9}url'):
-                    loc = url_elem.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc')
-                    priority = url_elem.find('{http://www.sitemaps.org/schemas/sitemap/0.9}priority')
-                    changefreq = url_elem.find('{http://www.sitemaps.org/schemas/sitemap/0.9}changefreq')
+                        }
+                
+                # Обрабатываем обычный sitemap
+                elif root_kind == 'urlset' and elem.tag == _SITEMAP_NS + 'url':
+                    loc = elem.find(_SITEMAP_NS + 'loc')
+                    priority = elem.find(_SITEMAP_NS + 'priority')
+                    changefreq = elem.find(_SITEMAP_NS + 'changefreq')
                     
                     if loc is not None:
-                        url_data = {
+                        yield {
                             'url': loc.text,
                             'type': 'page',
                             'priority': float(priority.text) if priority is not None else 0.5,
                             'changefreq': changefreq.text if changefreq is not None else 'unknown'
                         }
-                        urls.append(url_data)
+                
+                else:
+                    continue
+                
+                elem.clear()
+                del root[:]
         
         except ET.ParseError:
             # Если не XML, проверяем robots.txt
-            if 'robots.txt' in response.url:
-                urls.extend(self._parse_robots_txt(response.text))
-        
-        return urls
+            if root is None and 'robots.txt' in response.url:
+                yield from self._parse_robots_txt(response.text)
     
     def _parse_robots_txt(self, robots_content: str) -> List[Dict[str, Any]]:
         """Извлекает sitemap URLs из robots.txt"""
@@ -214,7 +342,7 @@ class SitemapParser:
         
         for line in robots_content.split('\n'):
             line = line.strip()
-            if line.lower().startswith('sitemap:'):
+            if line[:8].lower() == 'sitemap:':
                 sitemap_url = line.split(':', 1)[1].strip()
                 urls.append({
                     'url': sitemap_url,
@@ -253,6 +381,47 @@ class MLNavigationDiscovery:
             r'photo', r'image', r'pic', r'picture',
             r'фото', r'изображение', r'картинка'
         ]
+        
+        # Все категории объединены в одно выражение с именованной группой на
+        # категорию. Оно обёрнуто в lookahead, поэтому finditer проверяет каждую
+        # позицию и совпадения разных категорий не поглощают друг друга
+        # (слова разных категорий не являются префиксами друг друга)
+        self._fused_link_regex = re.compile(
+            '(?=' + '|'.join(
+                f"(?P<{category}>{'|'.join(patterns)})"
+                for category, patterns in self.link_patterns.items()
+            ) + ')',
+            re.IGNORECASE
+        )
+        self._fused_image_regex = re.compile('|'.join(self.image_indicators), re.IGNORECASE)
+        # Порядок категорий задаёт столбцы матриц совпадений
+        self._categories = tuple(self.link_patterns)
+        self._category_index = {category: i for i, category in enumerate(self._categories)}
+        self._keyword_automaton = self._build_keyword_automaton()
+    
+    def _build_keyword_automaton(self):
+        """Автомат Ахо-Корасик по всем ключевым словам (все они — литералы)
+        
+        Значение слова — (длина, столбцы категорий, индикатор изображения). Находит все
+        вхождения, включая перекрывающиеся, за один линейный проход.
+        """
+        if ahocorasick is None:
+            return None
+        
+        keywords: Dict[str, Tuple[Set[str], bool]] = {}
+        for category, patterns in self.link_patterns.items():
+            for pattern in patterns:
+                keywords.setdefault(pattern.lower(), (set(), False))[0].add(category)
+        for indicator in self.image_indicators:
+            categories, _ = keywords.get(indicator.lower(), (set(), False))
+            keywords[indicator.lower()] = (categories, True)
+        
+        automaton = ahocorasick.Automaton()
+        for keyword, (categories, is_image) in keywords.items():
+            columns = tuple(self._category_index[category] for category in categories)
+            automaton.add_word(keyword, (len(keyword), columns, is_image))
+        automaton.make_automaton()
+        return automaton
     
     def analyze_page_structure(self, response) -> Dict[str, Any]:
         """Анализирует структуру страницы для поиска навигационных паттернов"""
@@ -264,19 +433,23 @@ class MLNavigationDiscovery:
             'confidence_score': 0.0
         }
         
-        # Анализируем ссылки
-        links = response.css('a[href]')
-        for link in links:
-            href = link.attrib.get('href', '')
-            text = link.css('::text').get('').strip().lower()
-            
-            link_analysis = self._analyze_link(href, text)
+        # Анализируем ссылки одним проходом по дереву lxml, без обёрток Selector
+        root = response.selector.root
+        hrefs, texts = [], []
+        for link in root.iter('a'):
+            href = link.get('href')
+            if href is None:
+                continue
+            hrefs.append(href)
+            texts.append(_first_text(link).strip().lower())
+        
+        for link_analysis in self._analyze_links(hrefs, texts):
             if link_analysis['relevance'] > 0.5:
                 analysis['navigation_links'].append(link_analysis)
         
         # Анализируем контейнеры изображений
-        image_containers = response.css('div, section, article').getall()
-        for container in image_containers[:50]:  # Ограничиваем количество
+        # Ограничиваем количество; контейнеры не сериализуются обратно в HTML
+        for container in islice(root.iter('div', 'section', 'article'), 50):
             container_analysis = self._analyze_container(container)
             if container_analysis['image_density'] > 0.3:
                 analysis['image_containers'].append(container_analysis)
@@ -288,45 +461,107 @@ class MLNavigationDiscovery:
     
     def _analyze_link(self, href: str, text: str) -> Dict[str, Any]:
         """Анализирует отдельную ссылку"""
-        relevance = 0.0
-        link_type = 'unknown'
-        
-        # Проверяем паттерны в URL
-        for pattern_type, patterns in self.link_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, href, re.IGNORECASE):
-                    relevance += 0.3
-                    link_type = pattern_type
-                    break
-        
-        # Проверяем паттерны в тексте ссылки
-        for pattern_type, patterns in self.link_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    relevance += 0.4
-                    if link_type == 'unknown':
-                        link_type = pattern_type
-                    break
-        
-        # Проверяем индикаторы изображений
-        for indicator in self.image_indicators:
-            if re.search(indicator, href + ' ' + text, re.IGNORECASE):
-                relevance += 0.3
-                break
+        return self._analyze_links([href], [text])[0]
+    
+    def _analyze_links(self, hrefs: List[str], texts: List[str]) -> List[Dict[str, Any]]:
+        """Анализирует пакет ссылок одним проходом по ключевым словам
+        
+        href и текст всех ссылок склеиваются в одну строку через '\x01';
+        номер сегмента для совпадения находится бинарным поиском по смещениям.
+        Релевантность считается одним векторным ядром по матрицам совпадений.
+        """
+        segments = []
+        for href, text in zip(hrefs, texts):
+            segments.append(href)
+            segments.append(text)
+        
+        if self._keyword_automaton is not None:
+            category_hits, image_hits = self._scan_segments_automaton(segments)
+        else:
+            category_hits, image_hits = self._scan_segments_regex(segments)
+        
+        # Чётные строки — href, нечётные — текст ссылки
+        href_hits = category_hits[0::2]
+        text_hits = category_hits[1::2]
+        relevance = _score_links(href_hits, text_hits, image_hits)
+        
+        # Тип ссылки: последняя категория из URL, иначе первая из текста
+        last_column = len(self._categories) - 1
+        href_type = last_column - href_hits[:, ::-1].argmax(axis=1)
+        text_type = text_hits.argmax(axis=1)
+        type_index = np.where(href_hits.any(axis=1), href_type,
+                              np.where(text_hits.any(axis=1), text_type, -1))
         
-        return {
-            'href': href,
-            'text': text,
-            'type': link_type,
-            'relevance': min(relevance, 1.0)
-        }
+        return [
+            {
+                'href': href,
+                'text': text,
+                'type': self._categories[index] if index >= 0 else 'unknown',
+                'relevance': score
+            }
+            for href, text, index, score in zip(hrefs, texts, type_index.tolist(), relevance.tolist())
+        ]
     
-    def _analyze_container(self, container_html: str) -> Dict[str, Any]:
-        """Анализирует контейнер на предмет содержания изображений"""
-        # Подсчитываем изображения и ссылки
-        img_count = container_html.count('<img')
-        link_count = container_html.count('<a')
-        total_tags = container_html.count('<')
+    @staticmethod
+    def _segment_starts(segments: List[str]) -> List[int]:
+        """Смещения начала сегментов в строке, склеенной через '\x01'"""
+        starts = []
+        offset = 0
+        for segment in segments:
+            starts.append(offset)
+            offset += len(segment) + 1
+        return starts
+    
+    def _empty_hits(self, segments: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Нулевые матрица категорий (сегмент × категория) и флаги изображений по ссылкам"""
+        category_hits = np.zeros((len(segments), len(self._categories)), dtype=np.bool_)
+        image_hits = np.zeros(len(segments) // 2, dtype=np.bool_)
+        return category_hits, image_hits
+    
+    def _scan_segments_automaton(self, segments: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Совпадения категорий по сегментам и индикаторы изображений (Ахо-Корасик)"""
+        # Регистр снимается по сегментам, чтобы смещения считались по той же строке
+        segments = [segment.lower() for segment in segments]
+        starts = self._segment_starts(segments)
+        
+        category_hits, image_hits = self._empty_hits(segments)
+        for end, (length, columns, is_image) in self._keyword_automaton.iter('\x01'.join(segments)):
+            segment = bisect_right(starts, end - length + 1) - 1
+            for column in columns:
+                category_hits[segment, column] = True
+            if is_image:
+                image_hits[segment // 2] = True
+        return category_hits, image_hits
+    
+    def _scan_segments_regex(self, segments: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Совпадения категорий по сегментам и индикаторы изображений (регулярные выражения)"""
+        blob = '\x01'.join(segments)
+        starts = self._segment_starts(segments)
+        
+        category_hits, image_hits = self._empty_hits(segments)
+        for match in self._fused_link_regex.finditer(blob):
+            segment = bisect_right(starts, match.start()) - 1
+            category_hits[segment, self._category_index[match.lastgroup]] = True
+        
+        # Индикаторы изображений ищутся в href и тексте ссылки вместе
+        for match in self._fused_image_regex.finditer(blob):
+            image_hits[(bisect_right(starts, match.start()) - 1) // 2] = True
+        return category_hits, image_hits
+    
+    def _analyze_container(self, container) -> Dict[str, Any]:
+        """Анализирует контейнер (элемент lxml) на предмет содержания изображений"""
+        # Подсчитываем изображения и ссылки по дереву; total_tags считает
+        # открывающие и закрывающие теги, как раньше в сериализованном HTML
+        img_count = 0
+        link_count = 0
+        total_tags = 0
+        for element in container.iter():
+            tag = element.tag
+            if tag == 'img':
+                img_count += 1
+            elif tag == 'a':
+                link_count += 1
+            total_tags += 1 if not isinstance(tag, str) or tag in _VOID_TAGS else 2
         
         image_density = img_count / max(total_tags, 1)
         link_density = link_count / max(total_tags, 1)
@@ -354,6 +589,51 @@ class MLNavigationDiscovery:
         return min(confidence, 1.0)
 
 
+_INFINITE_SCROLL_SCRIPT = '''
+                async () => {
+                    let totalHeight = 0;
+                    const distance = 100;
+                    const maxScrolls = 20;
+                    let scrollCount = 0;
+                    
+                    while (scrollCount < maxScrolls) {
+                        const scrollHeight = document.body.scrollHeight;
+                        window.scrollBy(0, distance);
+                        totalHeight += distance;
+                        
+                        if (totalHeight >= scrollHeight) {
+                            break;
+                        }
+                        
+                        await new Promise(resolve => setTimeout(resolve, 500));
+                        scrollCount++;
+                    }
+                }
+            '''
+
+_LOAD_MORE_SCRIPT = Template('''
+                async () => {
+                    const buttons = document.querySelectorAll('$selector');
+                    const maxClicks = $max_clicks;
+                    let clickCount = 0;
+                    
+                    for (const button of buttons) {
+                        if (clickCount >= maxClicks) break;
+                        
+                        if (button && button.offsetParent !== null) {
+                            button.scrollIntoView();
+                            const waitTime = $wait;
+                            await new Promise(resolve => setTimeout(resolve, waitTime));
+                            button.click();
+                            const pauseTime = $pause;
+                            await new Promise(resolve => setTimeout(resolve, pauseTime));
+                            clickCount++;
+                        }
+                    }
+                }
+            ''')
+
+
 class AutoNavigationManager:
     """Главный менеджер автоматической навигации"""
     
@@ -363,22 +643,55 @@ class AutoNavigationManager:
         self.sitemap_parser = SitemapParser()
         self.ml_discovery = MLNavigationDiscovery()
         
-        self.visited_urls: Set[str] = set()
+        self._visited_hashes: Set[int] = set()
         self.discovered_patterns: Dict[str, NavigationPattern] = {}
         
+        # Пул для анализа страницы вне event loop: детекция пагинации и
+        # ML discovery независимы и выполняются параллельно
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='snapcrawler-nav')
+        
+        # Связанные методы-колбэки создаются один раз, а не на каждый Request
+        self._parse_sitemap_cb = self._parse_sitemap_response
+        self._parse_robots_cb = self._parse_robots_for_sitemaps
+        self._robots_failed_cb = self._robots_failed
+        
         # Настройки из конфига
         self.max_depth = config.get('max_depth', 5)
         self.max_pages_per_site = config.get('limits', {}).get('max_images', 1000)
         self.enable_sitemap = config.get('enable_sitemap_discovery', True)
         self.enable_ml_discovery = config.get('enable_ml_discovery', True)
+        
+        # Задержки и таймауты Playwright-скриптов разрешаются один раз
+        crawling = config.get('crawling', {})
+        delays = crawling.get('delays', {})
+        timeouts = crawling.get('timeouts', {})
+        self._load_more_wait = delays.get('load_more_wait', 1000)
+        self._load_more_pause = delays.get('load_more_pause', 2000)
+        self._navigation_timeout = timeouts.get('navigation_timeout', 2000)
+        self._load_more_timeout = timeouts.get('load_more_timeout', 3000)
     
-    def generate_navigation_requests(self, response) -> List[Request]:
+    async def generate_navigation_requests(self, response) -> List[Request]:
         """Генерирует запросы для автоматической навигации"""
         requests = []
         
+        # Текст и дерево разбираются заранее, чтобы потоки пула
+        # не создавали их одновременно
+        response.selector
+        
+        loop = asyncio.get_running_loop()
+        pagination_task = loop.run_in_executor(
+            self._executor, self.pagination_detector.detect_navigation_patterns, response, 2
+        )
+        if self.enable_ml_discovery:
+            ml_task = loop.run_in_executor(
+                self._executor, self.ml_discovery.analyze_page_structure, response
+            )
+            pagination_patterns, analysis = await asyncio.gather(pagination_task, ml_task)
+        else:
+            pagination_patterns, analysis = await pagination_task, None
+        
         # 1. Обнаруживаем паттерны пагинации
-        pagination_patterns = self.pagination_detector.detect_navigation_patterns(response)
-        for pattern in pagination_patterns[:2]:  # Берем топ-2 паттерна
+        for _, pattern in pagination_patterns:  # Берем топ-2 паттерна
             pattern_requests = self._generate_pagination_requests(response, pattern)
             requests.extend(pattern_requests)
         
@@ -388,18 +701,19 @@ class AutoNavigationManager:
             requests.extend(sitemap_requests)
         
         # 3. ML-based discovery
-        if self.enable_ml_discovery:
-            ml_requests = self._generate_ml_discovery_requests(response)
+        if analysis is not None:
+            ml_requests = self._generate_ml_discovery_requests(response, analysis)
             requests.extend(ml_requests[:10])  # Ограничиваем количество
         
         # Фильтруем дубликаты
         unique_requests = []
-        seen_urls = set()
+        seen_hashes: Set[int] = set()
         
         for request in requests:
-            if request.url not in seen_urls and request.url not in self.visited_urls:
+            url_hash = _url_hash(request.url)
+            if url_hash not in seen_hashes and url_hash not in self._visited_hashes:
                 unique_requests.append(request)
-                seen_urls.add(request.url)
+                seen_hashes.add(url_hash)
         
         return unique_requests[:20]  # Ограничиваем общее количество
     
@@ -411,11 +725,11 @@ class AutoNavigationManager:
             # Классическая пагинация
             for selector in pattern.selectors:
                 try:
-                    links = response.css(selector)
+                    links = response.xpath(_css_to_xpath(selector))
                     for link in links[:5]:  # Ограничиваем количество
                         href = link.attrib.get('href')
                         if href:
-                            url = urljoin(response.url, href)
+                            url = response.urljoin(href)
                             request = Request(
                                 url=url,
                                 meta={
@@ -456,35 +770,65 @@ class AutoNavigationManager:
         return requests
     
     def _generate_sitemap_requests(self, response) -> List[Request]:
-        """Генерирует запросы для sitemaps"""
-        requests = []
-        
-        base_url = f"{urlparse(response.url).scheme}://{urlparse(response.url).netloc}"
-        sitemap_urls = self.sitemap_parser.discover_sitemaps(base_url)
+        """Генерирует запросы для sitemaps
+        
+        Сначала запрашивается только robots.txt: типовые пути sitemap
+        перебираются, лишь если в нём нет директив Sitemap.
+        """
+        parsed = urlparse(response.url)
+        
+        return [Request(
+            url=f"{parsed.scheme}://{parsed.netloc}/robots.txt",
+            callback=self._parse_robots_cb,
+            errback=self._robots_failed_cb,
+            meta={
+                'navigation_type': 'sitemap',
+                'depth': 0
+            }
+        )]
+    
+    def _parse_robots_for_sitemaps(self, response):
+        """Извлекает sitemaps из robots.txt, иначе пробует типовые пути"""
+        sitemaps = self.sitemap_parser._parse_robots_txt(response.text)
+        if sitemaps:
+            sitemap_urls = [sitemap['url'] for sitemap in sitemaps]
+        else:
+            sitemap_urls = self._conventional_sitemap_urls(response.url)
         
         for sitemap_url in sitemap_urls:
-            request = Request(
-                url=sitemap_url,
-                callback=self._parse_sitemap_response,
-                meta={
-                    'navigation_type': 'sitemap',
-                    'depth': 0
-                }
-            )
-            requests.append(request)
-        
-        return requests
+            yield self._sitemap_request(sitemap_url)
+    
+    def _robots_failed(self, failure):
+        """robots.txt недоступен — пробуем типовые пути sitemap"""
+        for sitemap_url in self._conventional_sitemap_urls(failure.request.url):
+            yield self._sitemap_request(sitemap_url)
+    
+    def _conventional_sitemap_urls(self, url: str) -> List[str]:
+        """Типовые пути sitemap для сайта, кроме самого robots.txt"""
+        return [
+            sitemap_url for sitemap_url in self.sitemap_parser.discover_sitemaps(url)
+            if not sitemap_url.endswith('/robots.txt')
+        ]
+    
+    def _sitemap_request(self, sitemap_url: str) -> Request:
+        """Запрос на загрузку sitemap"""
+        return Request(
+            url=sitemap_url,
+            callback=self._parse_sitemap_cb,
+            meta={
+                'navigation_type': 'sitemap',
+                'depth': 0
+            }
+        )
     
-    def _generate_ml_discovery_requests(self, response) -> List[Request]:
+    def _generate_ml_discovery_requests(self, response, analysis: Dict[str, Any]) -> List[Request]:
         """Генерирует запросы на основе ML анализа"""
         requests = []
         
-        analysis = self.ml_discovery.analyze_page_structure(response)
-        
         # Генерируем запросы для релевантных ссылок
         for link_data in analysis['navigation_links']:
             if link_data['relevance'] > 0.6:
-                url = urljoin(response.url, link_data['href'])
+                url = response.urljoin(link_data['href'])
                 request = Request(
                     url=url,
                     meta={
@@ -501,65 +845,29 @@ class AutoNavigationManager:
     def _get_infinite_scroll_methods(self) -> List[PageMethod]:
         """Playwright методы для infinite scroll"""
         return [
-            PageMethod('evaluate', '''
-                async () => {
-                    let totalHeight = 0;
-                    const distance = 100;
-                    const maxScrolls = 20;
-                    let scrollCount = 0;
-                    
-                    while (scrollCount < maxScrolls) {
-                        const scrollHeight = document.body.scrollHeight;
-                        window.scrollBy(0, distance);
-                        totalHeight += distance;
-                        
-                        if (totalHeight >= scrollHeight) {
-                            break;
-                        }
-                        
-                        await new Promise(resolve => setTimeout(resolve, 500));
-                        scrollCount++;
-                    }
-                }
-            '''),
-            PageMethod('wait_for_timeout', self.config.get('crawling', {}).get('timeouts', {}).get('navigation_timeout', 2000)),
+            PageMethod('evaluate', _INFINITE_SCROLL_SCRIPT),
+            PageMethod('wait_for_timeout', self._navigation_timeout),
         ]
     
     def _get_load_more_methods(self, pattern: NavigationPattern) -> List[PageMethod]:
         """Playwright методы для load more buttons"""
-        methods = []
-        
-        for selector in pattern.selectors:
-            methods.append(PageMethod('evaluate', f'''
-                async () => {{
-                    const buttons = document.querySelectorAll('{selector}');
-                    const maxClicks = {pattern.metadata.get('max_clicks', 10)};
-                    let clickCount = 0;
-                    
-                    for (const button of buttons) {{
-                        if (clickCount >= maxClicks) break;
-                        
-                        if (button && button.offsetParent !== null) {{
-                            button.scrollIntoView();
-                            const waitTime = {self.config.get('crawling', {}).get('delays', {}).get('load_more_wait', 1000)};
-                            await new Promise(resolve => setTimeout(resolve, waitTime));
-                            button.click();
-                            const pauseTime = {self.config.get('crawling', {}).get('delays', {}).get('load_more_pause', 2000)};
-                            await new Promise(resolve => setTimeout(resolve, pauseTime));
-                            clickCount++;
-                        }}
-                    }}
-                }}
-            '''))
+        max_clicks = pattern.metadata.get('max_clicks', 10)
+        methods = [
+            PageMethod('evaluate', _LOAD_MORE_SCRIPT.substitute(
+                selector=selector,
+                max_clicks=max_clicks,
+                wait=self._load_more_wait,
+                pause=self._load_more_pause
+            ))
+            for selector in pattern.selectors
+        ]
         
-        methods.append(PageMethod('wait_for_timeout', self.config.get('crawling', {}).get('timeouts', {}).get('load_more_timeout', 3000)))
+        methods.append(PageMethod('wait_for_timeout', self._load_more_timeout))
         return methods
     
     def _parse_sitemap_response(self, response):
         """Обрабатывает ответ sitemap"""
-        urls = self.sitemap_parser.parse_sitemap(response)
-        
-        for url_data in urls:
+        for url_data in self.sitemap_parser.parse_sitemap(response):
             if url_data['type'] == 'page' and url_data['priority'] > 0.3:
                 yield Request(
                     url=url_data['url'],
@@ -570,11 +878,4 @@ class AutoNavigationManager:
                     }
                 )
             elif url_data['type'] == 'sitemap':
-                yield Request(
-                    url=url_data['url'],
-                    callback=self._parse_sitemap_response,
-                    meta={
-                        'navigation_type': 'sitemap',
-                        'depth': 0
-                    }
-                )
+                yield self._sitemap_request(url_data['url'])
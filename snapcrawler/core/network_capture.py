@@ -5,10 +5,61 @@
 
 import json
 import logging
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, Optional, Set, Tuple
 from urllib.parse import urljoin, urlparse
 import re
+from bisect import bisect_right
+from collections import OrderedDict
 from dataclasses import dataclass
+from functools import lru_cache
+
+try:
+    import hyperscan
+except ImportError:  # Опционально: без hyperscan работает объединённое регулярное выражение
+    hyperscan = None
+
+try:
+    import orjson
+except ImportError:  # Опционально: без orjson данные сериализуются стандартным json
+    orjson = None
+
+try:
+    import ahocorasick
+except ImportError:  # Опционально: без pyahocorasick работает объединённое регулярное выражение
+    ahocorasick = None
+
+# Признаки URL изображения: расширения файлов и ключевые слова
+_IMAGE_URL_MARKERS = (
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.heic', '.svg', '.bmp',
+    'image', 'img', 'photo', 'picture', 'thumbnail', 'avatar', 'icon'
+)
+_IMAGE_URL_MARKER_REGEX = re.compile('|'.join(re.escape(marker) for marker in _IMAGE_URL_MARKERS))
+
+
+def _build_marker_automaton():
+    """Автомат Ахо-Корасик по признакам URL изображения — один проход по строке"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for marker in _IMAGE_URL_MARKERS:
+        automaton.add_word(marker, marker)
+    automaton.make_automaton()
+    return automaton
+
+
+_image_url_marker_automaton = _build_marker_automaton()
+
+
+@lru_cache(maxsize=8192)
+def _looks_like_image_url(text: str) -> bool:
+    """Есть ли в строке признак URL изображения (расширение или ключевое слово)
+    
+    Результат кэшируется: в данных WebSocket одни и те же URL повторяются.
+    """
+    text_lower = text.lower()
+    if _image_url_marker_automaton is not None:
+        return next(_image_url_marker_automaton.iter(text_lower), None) is not None
+    return _IMAGE_URL_MARKER_REGEX.search(text_lower) is not None
 
 
 @dataclass
@@ -34,17 +85,45 @@ class NetworkTrafficCapture:
             image_domains=network_config.get('image_domains', []),
             max_captured_urls=network_config.get('max_captured_urls', 1000)
         )
-        self.captured_urls: Set[str] = set()
+        # Упорядоченный словарь как LRU-множество, ограниченное max_captured_urls
+        self.captured_urls: 'OrderedDict[str, None]' = OrderedDict()
         self.logger = logging.getLogger(__name__)
         
         # Паттерны для поиска URL изображений в JSON
         self.image_url_patterns = [
-            r'"(?:image|img|photo|picture|thumbnail|avatar|icon)(?:_url|Url|URL)?":\s*"([^"]+)"',
-            r'"url":\s*"([^"]+\.(?:jpg|jpeg|png|gif|webp|avif|heic|svg))"',
-            r'"src":\s*"([^"]+\.(?:jpg|jpeg|png|gif|webp|avif|heic|svg))"',
-            r'"href":\s*"([^"]+\.(?:jpg|jpeg|png|gif|webp|avif|heic|svg))"',
+            r'"(?:image|img|photo|picture|thumbnail|avatar|icon)(?:_url|Url|URL)?":\s*"([^"\x1f]+)"',
+            r'"url":\s*"([^"\x1f]+\.(?:jpg|jpeg|png|gif|webp|avif|heic|svg))"',
+            r'"src":\s*"([^"\x1f]+\.(?:jpg|jpeg|png|gif|webp|avif|heic|svg))"',
+            r'"href":\s*"([^"\x1f]+\.(?:jpg|jpeg|png|gif|webp|avif|heic|svg))"',
         ]
+        # Все паттерны в одном выражении: у каждой альтернативы ровно одна группа.
+        # Ключи и расширения — ASCII, поэтому регистр сравнивается без Unicode-свёртки
+        self._fused_pattern = re.compile('|'.join(self.image_url_patterns), re.IGNORECASE | re.ASCII)
+        self._byte_patterns = [re.compile(p.encode(), re.IGNORECASE) for p in self.image_url_patterns]
+        self._hs_db = self._build_hyperscan_db()
         
+        # Кортеж расширений: str.endswith проверяет его за один вызов
+        self._image_ext_tuple = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.heic', '.svg', '.bmp', '.tiff')
+        
+    def _build_hyperscan_db(self):
+        """База Hyperscan по всем паттернам — один проход по байтам на документ
+        
+        Hyperscan не поддерживает группы захвата, поэтому он сообщает только
+        начало совпадения; само значение извлекается байтовым паттерном с этой позиции.
+        """
+        if hyperscan is None:
+            return None
+        
+        count = len(self.image_url_patterns)
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[p.encode() for p in self.image_url_patterns],
+            ids=list(range(count)),
+            elements=count,
+            flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST] * count
+        )
+        return db
+    
     def get_network_interception_methods(self) -> List:
         """Возвращает методы Playwright для перехвата сетевых запросов"""
         if not self.config.enabled:
@@ -73,7 +152,7 @@ class NetworkTrafficCapture:
             
             # Проверяем, является ли запрос изображением
             if self._is_image_request(url):
-                self.captured_urls.add(url)
+                self._remember_url(url)
                 self.logger.debug(f"Перехвачен запрос изображения: {url}")
             
             # Продолжаем выполнение запроса
@@ -83,18 +162,19 @@ class NetworkTrafficCapture:
             self.logger.error(f"Ошибка при обработке маршрута: {e}")
             route.continue_()
     
+    def _remember_url(self, url: str):
+        """Добавляет URL в набор захваченных, вытесняя самый давний сверх лимита"""
+        if url in self.captured_urls:
+            self.captured_urls.move_to_end(url)
+            return
+        self.captured_urls[url] = None
+        if len(self.captured_urls) > self.config.max_captured_urls:
+            self.captured_urls.popitem(last=False)
+    
     def _is_image_request(self, url: str) -> bool:
         """Проверяет, является ли URL запросом изображения"""
-        image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.heic', '.svg', '.bmp', '.tiff'}
-        parsed_url = urlparse(url.lower())
-        
-        # Проверка по расширению
-        for ext in image_extensions:
-            if parsed_url.path.endswith(ext):
-                return True
-                
-        # Проверка по MIME типу в заголовках (если доступно)
-        return False
+        # Проверка по расширению; MIME тип здесь недоступен
+        return urlparse(url).path.lower().endswith(self._image_ext_tuple)
     
     def _get_fetch_interception_script(self) -> str:
         """JavaScript для перехвата Fetch API запросов"""
@@ -110,20 +190,17 @@ class NetworkTrafficCapture:
                         // Сохраняем URL изображений
                         if (contentType.startsWith('image/') || 
                             /\\.(jpg|jpeg|png|gif|webp|avif|heic|svg)$/i.test(url)) {
-                            window._capturedImageUrls = window._capturedImageUrls || [];
-                            window._capturedImageUrls.push(url);
+                            window._capturedImageUrls = window._capturedImageUrls || new Set();
+                            window._capturedImageUrls.add(url);
                         }
                         
-                        // Анализируем JSON ответы
+                        // Сохраняем исходный текст JSON ответов без разбора:
+                        // Python ищет URL прямо в нём. Одинаковые ответы
+                        // с одного URL хранятся один раз
                         if (contentType.includes('application/json')) {
                             response.clone().text().then(text => {
-                                try {
-                                    const data = JSON.parse(text);
-                                    window._capturedJsonData = window._capturedJsonData || [];
-                                    window._capturedJsonData.push({url: url, data: data});
-                                } catch (e) {
-                                    // Игнорируем ошибки парсинга JSON
-                                }
+                                window._capturedJsonData = window._capturedJsonData || new Map();
+                                window._capturedJsonData.set(url + '\\u001f' + text, {url: url, text: text});
                             });
                         }
                     } catch (e) {
@@ -145,12 +222,11 @@ class NetworkTrafficCapture:
                 
                 const originalOnMessage = ws.onmessage;
                 ws.onmessage = function(event) {
-                    try {
-                        const data = JSON.parse(event.data);
-                        window._capturedWebSocketData = window._capturedWebSocketData || [];
-                        window._capturedWebSocketData.push({url: url, data: data});
-                    } catch (e) {
-                        // Не JSON данные, игнорируем
+                    // Текстовые сообщения сохраняются как есть (повторы — один раз),
+                    // бинарные игнорируются
+                    if (typeof event.data === 'string') {
+                        window._capturedWebSocketData = window._capturedWebSocketData || new Map();
+                        window._capturedWebSocketData.set(url + '\\u001f' + event.data, {url: url, text: event.data});
                     }
                     
                     if (originalOnMessage) {
@@ -169,14 +245,14 @@ class NetworkTrafficCapture:
             urls = []
             
             # Получаем URL изображений, захваченных через fetch
-            captured_image_urls = page.evaluate('() => window._capturedImageUrls || []')
+            captured_image_urls = page.evaluate('() => Array.from(window._capturedImageUrls || [])')
             if captured_image_urls:
                 urls.extend(captured_image_urls)
                 self.logger.info(f"Извлечено {len(captured_image_urls)} URL изображений через fetch")
             
             # Анализируем JSON данные
             if self.config.capture_json:
-                captured_json_data = page.evaluate('() => window._capturedJsonData || []')
+                captured_json_data = page.evaluate('() => Array.from((window._capturedJsonData || new Map()).values())')
                 json_urls = self._extract_urls_from_json_data(captured_json_data)
                 urls.extend(json_urls)
                 if json_urls:
@@ -184,7 +260,7 @@ class NetworkTrafficCapture:
             
             # Анализируем WebSocket данные
             if self.config.capture_websockets:
-                captured_ws_data = page.evaluate('() => window._capturedWebSocketData || []')
+                captured_ws_data = page.evaluate('() => Array.from((window._capturedWebSocketData || new Map()).values())')
                 ws_urls = self._extract_urls_from_websocket_data(captured_ws_data)
                 urls.extend(ws_urls)
                 if ws_urls:
@@ -192,7 +268,7 @@ class NetworkTrafficCapture:
             
             # Добавляем к общему набору захваченных URL
             for url in urls:
-                self.captured_urls.add(url)
+                self._remember_url(url)
             
             return list(set(urls))  # Убираем дубликаты
             
@@ -201,41 +277,117 @@ class NetworkTrafficCapture:
             return []
     
     def _extract_urls_from_json_data(self, json_data_list: List[Dict]) -> List[str]:
-        """Извлекает URL изображений из JSON данных"""
+        """Извлекает URL изображений из JSON данных
+        
+        Тексты всех документов склеиваются через '\x1f' и сканируются один раз;
+        документ для совпадения (и его базовый URL) находится по смещению.
+        """
         urls = []
+        texts = []
+        base_urls = []
         
         for item in json_data_list:
             try:
-                json_text = json.dumps(item.get('data', {}))
-                base_url = item.get('url', '')
-                
-                # Применяем регулярные выражения для поиска URL
-                for pattern in self.image_url_patterns:
-                    matches = re.findall(pattern, json_text, re.IGNORECASE)
-                    for match in matches:
-                        # Преобразуем относительные URL в абсолютные
-                        if match.startswith('http'):
-                            urls.append(match)
-                        elif base_url:
-                            absolute_url = urljoin(base_url, match)
-                            urls.append(absolute_url)
-                            
+                texts.append(self._json_text(item))
+                base_urls.append(item.get('url', ''))
             except Exception as e:
                 self.logger.debug(f"Ошибка анализа JSON данных: {e}")
                 continue
         
+        if not texts:
+            return urls
+        
+        # Схема базового URL разбирается один раз на документ
+        base_schemes = [urlparse(base_url).scheme for base_url in base_urls]
+        
+        # Ищем URL всеми паттернами за один проход по всем документам
+        for doc_index, match in self._find_json_image_urls(texts):
+            # Преобразуем относительные URL в абсолютные
+            if match.startswith('http'):
+                urls.append(match)
+            elif base_urls[doc_index]:
+                urls.append(self._absolute_url(match, base_urls[doc_index], base_schemes[doc_index]))
+        
         return urls
     
+    @staticmethod
+    def _absolute_url(url: str, base_url: str, base_scheme: str) -> str:
+        """Абсолютный URL; для адресов без схемы ('//host/...') urljoin не нужен"""
+        if base_scheme and url.startswith('//'):
+            return f'{base_scheme}:{url}'
+        return urljoin(base_url, url)
+    
+    @staticmethod
+    def _json_text(item: Dict) -> str:
+        """Текст JSON документа: исходный ответ, если он сохранён, иначе сериализация данных"""
+        text = item.get('text')
+        if text is None:
+            data = item.get('data', {})
+            # orjson сериализует в C сразу в UTF-8
+            return orjson.dumps(data).decode('utf-8') if orjson is not None else json.dumps(data)
+        # Экранированный слэш допустим в JSON ('http:\/\/...'), а паттерны ищут обычный
+        return text.replace('\\/', '/')
+    
+    @staticmethod
+    def _segment_starts(segments: List) -> List[int]:
+        """Смещения начала сегментов в буфере, склеенном через один разделитель"""
+        starts = []
+        offset = 0
+        for segment in segments:
+            starts.append(offset)
+            offset += len(segment) + 1
+        return starts
+    
+    def _find_json_image_urls(self, texts: List[str]) -> List[Tuple[int, str]]:
+        """Пары (номер документа, значение), найденные паттернами URL изображений"""
+        if self._hs_db is None:
+            starts = self._segment_starts(texts)
+            return [
+                (bisect_right(starts, match.start()) - 1, match.group(match.lastindex))
+                for match in self._fused_pattern.finditer('\x1f'.join(texts))
+            ]
+        
+        # Смещения Hyperscan — в байтах, поэтому границы считаются по закодированным частям
+        parts = [text.encode('utf-8', 'replace') for text in texts]
+        starts = self._segment_starts(parts)
+        data = b'\x1f'.join(parts)
+        hits = {}
+        
+        def on_match(pattern_id, start, end, flags, context):
+            hits.setdefault((start, pattern_id), None)
+        
+        self._hs_db.scan(data, match_event_handler=on_match)
+        
+        matches = []
+        for start, pattern_id in sorted(hits):
+            match = self._byte_patterns[pattern_id].match(data, start)
+            if match:
+                matches.append((bisect_right(starts, start) - 1, match.group(1).decode('utf-8', 'replace')))
+        return matches
+    
     def _extract_urls_from_websocket_data(self, ws_data_list: List[Dict]) -> List[str]:
-        """Извлекает URL изображений из WebSocket данных"""
+        """Извлекает URL изображений из WebSocket данных
+        
+        Текст сообщения разбирается как JSON в Python, и в разобранных данных
+        ищутся значения, похожие на URL изображения, под любыми ключами.
+        Сообщения, не являющиеся JSON, пропускаются.
+        """
         urls = []
         
         for item in ws_data_list:
             try:
-                data = item.get('data', {})
                 base_url = item.get('url', '')
+                text = item.get('text')
+                if text is None:
+                    data = item.get('data', {})
+                else:
+                    try:
+                        data = orjson.loads(text) if orjson is not None else json.loads(text)
+                    except ValueError:
+                        # Не JSON данные, игнорируем
+                        continue
                 
-                # Рекурсивно ищем URL изображений в данных WebSocket
+                # Рекурсивно ищем URL изображений в разобранных данных WebSocket
                 found_urls = self._find_image_urls_recursive(data, base_url)
                 urls.extend(found_urls)
                 
@@ -246,45 +398,40 @@ class NetworkTrafficCapture:
         return urls
     
     def _find_image_urls_recursive(self, data: Any, base_url: str = '') -> List[str]:
-        """Рекурсивно ищет URL изображений в структуре данных"""
+        """Ищет URL изображений в структуре данных обходом с явным стеком
+        
+        Строки проверяются только как значения словарей; вложенность не
+        ограничена пределом рекурсии.
+        """
         urls = []
+        append = urls.append
+        looks_like_image_url = _looks_like_image_url
+        base_scheme = urlparse(base_url).scheme if base_url else ''
         
-        if isinstance(data, dict):
-            for key, value in data.items():
-                if isinstance(value, str) and self._looks_like_image_url(value):
-                    if value.startswith('http'):
-                        urls.append(value)
-                    elif base_url:
-                        urls.append(urljoin(base_url, value))
-                elif isinstance(value, (dict, list)):
-                    urls.extend(self._find_image_urls_recursive(value, base_url))
-                    
-        elif isinstance(data, list):
-            for item in data:
-                urls.extend(self._find_image_urls_recursive(item, base_url))
+        stack = [data]
+        pop = stack.pop
+        while stack:
+            node = pop()
+            if isinstance(node, dict):
+                for value in node.values():
+                    if isinstance(value, str):
+                        if looks_like_image_url(value):
+                            if value.startswith('http'):
+                                append(value)
+                            elif base_url:
+                                append(self._absolute_url(value, base_url, base_scheme))
+                    elif isinstance(value, (dict, list)):
+                        stack.append(value)
+            elif isinstance(node, list):
+                stack.extend(node)
         
         return urls
     
     def _looks_like_image_url(self, text: str) -> bool:
-        """Проверяет, похож ли текст на URL изображения"""
+        """Проверяет, похож ли текст на URL изображения (расширение или ключевое слово)"""
         if not isinstance(text, str):
             return False
-            
-        # Проверка расширений файлов
-        image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.heic', '.svg', '.bmp']
-        text_lower = text.lower()
-        
-        for ext in image_extensions:
-            if ext in text_lower:
-                return True
-        
-        # Проверка ключевых слов в URL
-        image_keywords = ['image', 'img', 'photo', 'picture', 'thumbnail', 'avatar', 'icon']
-        for keyword in image_keywords:
-            if keyword in text_lower:
-                return True
-                
-        return False
+        return _looks_like_image_url(text)
     
     def get_captured_urls(self) -> List[str]:
         """Возвращает все захваченные URL изображений"""
@@ -293,6 +440,7 @@ class NetworkTrafficCapture:
     def clear_captured_urls(self):
         """Очищает список захваченных URL"""
         self.captured_urls.clear()
+        _looks_like_image_url.cache_clear()
     
     def get_stats(self) -> Dict[str, Any]:
         """Возвращает статистику захвата"""
@@ -4,6 +4,7 @@
 """
 import multiprocessing
 import queue
+from multiprocessing.connection import wait
 import time
 import logging
 import os
@@ -12,6 +13,11 @@ from typing import Dict, Any
 from .crawling_module import run_crawling_module
 from .filtering_module import run_filtering_module
 
+try:
+    from faster_fifo import Queue as FasterFifoQueue
+except ImportError:  # Опционально: без faster-fifo используется multiprocessing.Queue
+    FasterFifoQueue = None
+
 class ParallelManager:
     """
     Главный оркестратор параллельной архитектуры обхода и фильтрации
@@ -44,11 +50,8 @@ class ParallelManager:
         self.logger = logging.getLogger('parallel_manager')
         
         # Компоненты multiprocessing
-        self.manager = multiprocessing.Manager()
-        queue_maxsize = self.config.get('crawling', {}).get('timeouts', {}).get('queue_maxsize', 1000)
-        self.image_queue = multiprocessing.Queue(maxsize=queue_maxsize)  # Изображения от обхода к фильтрации
+        self.image_queue = self._create_image_queue()  # Изображения от обхода к фильтрации
         self.stats_queue = multiprocessing.Queue()  # Статистика от обоих модулей
-        self.visited_urls = self.manager.dict()  # Общий учёт посещённых URL
         
         # Ссылки на процессы
         self.crawling_process = None
@@ -56,10 +59,17 @@ class ParallelManager:
         
         # Учёт статистики
         self.stats = {
-            'crawling': {'pages_crawled': 0, 'images_found': 0, 'queue_size': 0},
+            'crawling': {'pages_crawled': 0, 'images_found': 0, 'queue_size': 0, 'visited_urls': 0},
             'filtering': {'downloaded': 0, 'processed': 0, 'filtered_out': 0, 'folder_size_mb': 0}
         }
         
+    def _create_image_queue(self):
+        """Очередь изображений: faster-fifo с пакетными put_many/get_many, если установлен"""
+        timeouts = self.config.get('crawling', {}).get('timeouts', {})
+        if FasterFifoQueue is not None:
+            return FasterFifoQueue(max_size_bytes=timeouts.get('queue_max_bytes', 64 * 1024 * 1024))
+        return multiprocessing.Queue(maxsize=timeouts.get('queue_maxsize', 1000))
+    
     def start(self):
         """Запустить модули обхода и фильтрации в параллельном режиме"""
         self.logger.info("Запуск SnapCrawler в параллельном режиме")
@@ -109,6 +119,10 @@ class ParallelManager:
         last_stats_time = time.time()
         stats_interval = 10  # секунд
         
+        # Ждём событий вместо опроса раз в секунду: завершения процесса,
+        # прихода статистики или наступления времени вывода
+        processes = [self.crawling_process, self.filtering_process]
+        
         while True:
             # Проверяем, живы ли процессы
             if not self.crawling_process.is_alive() and not self.filtering_process.is_alive():
@@ -129,7 +143,8 @@ class ParallelManager:
                             self.stats['crawling'].update({
                                 'pages_crawled': stat['pages_crawled'],
                                 'images_found': stat['images_found'],
-                                'queue_size': stat['queue_size']
+                                'queue_size': stat['queue_size'],
+                                'visited_urls': stat.get('visited_urls', 0)
                             })
                         elif stat['type'] == 'filtering_stats':
                             self.stats['filtering'].update({
@@ -149,7 +164,11 @@ class ParallelManager:
                 self.print_statistics()
                 last_stats_time = current_time
             
-            time.sleep(1)
+            # Сентинел завершившегося процесса всегда готов, поэтому ждём только живые
+            waitables = [process.sentinel for process in processes if process.is_alive()]
+            waitables.append(self.stats_queue._reader)
+            remaining = stats_interval - (time.time() - last_stats_time)
+            wait(waitables, timeout=max(remaining, 0))
         
         # Финальная статистика
         self.print_final_statistics()
@@ -198,7 +217,7 @@ class ParallelManager:
         self.logger.info(f"Итоговый объём хранилища: {filter_stats['folder_size_mb']:.1f} MB")
         
         # Анализ «роста дерева»
-        total_urls = len(self.visited_urls)
+        total_urls = crawl_stats['visited_urls']
         self.logger.info(f"Всего уникальных URL обнаружено: {total_urls}")
         
         if crawl_stats['images_found'] > 0:
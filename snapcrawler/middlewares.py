@@ -1,32 +1,129 @@
+import asyncio
+import io
+import json
+import logging
 import random
+import re
+import sys
 import time
+from urllib.parse import urlparse
 from scrapy.downloadermiddlewares.retry import RetryMiddleware
+from scrapy import signals
 from scrapy.exceptions import IgnoreRequest
-import random
-import time
-import logging
+from scrapy.extensions.httpcache import DummyPolicy, RFC2616Policy
 from .utils.log_formatter import format_url_short, format_process_status
 
+try:
+    import ahocorasick
+except ImportError:  # Опционально: без pyahocorasick работает объединённое регулярное выражение
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:  # Опционально: без orjson JSON разбирается стандартным json
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # Опционально: без ijson JSON разбирается целиком через json.loads
+    ijson = None
+
+
+# URL изображений в тексте ответа; ищется прямо в байтах тела, без декодирования
+_IMG_RE = re.compile(rb'https?://[^\s"\'>]+\.(?:jpg|jpeg|png|gif|webp|svg)(?:\?[^\s"\'>]*)?', re.IGNORECASE)
+_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.bmp')
+# Ключи JSON, значения которых проверяются как URL изображений
+_JSON_IMAGE_KEYS = frozenset({'image', 'img', 'photo', 'picture', 'thumbnail', 'src', 'url'})
+
+
+# Типы содержимого, в которых не может быть ни CAPTCHA, ни ссылок на изображения
+_BINARY_CONTENT_PREFIXES = (b'image/', b'video/', b'audio/', b'font/')
+_BINARY_CONTENT_TYPES = frozenset({
+    b'application/octet-stream', b'application/pdf', b'application/zip',
+    b'application/gzip', b'application/x-protobuf', b'application/wasm'
+})
+
+
+def _is_binary_response(response):
+    """Бинарный ли ответ по заголовку Content-Type (тело не декодируется)"""
+    content_type = (response.headers.get(b'Content-Type') or b'').split(b';', 1)[0].strip().lower()
+    return content_type.startswith(_BINARY_CONTENT_PREFIXES) or content_type in _BINARY_CONTENT_TYPES
+
+
+def _is_html_response(response):
+    """HTML ли ответ по заголовку Content-Type"""
+    return b'html' in (response.headers.get(b'Content-Type') or b'').lower()
+
+
+class HtmlOnlyCachePolicy(DummyPolicy):
+    """Политика HTTP-кэша, сохраняющая только HTML-страницы (без изображений и прочих ответов)"""
+    
+    def should_cache_response(self, response, request):
+        return _is_html_response(response) and super().should_cache_response(response, request)
+
+
+class HtmlOnlyRFC2616Policy(RFC2616Policy):
+    """RFC2616Policy (Cache-Control/ETag сервера), сохраняющая только HTML-страницы"""
+    
+    def should_cache_response(self, response, request):
+        return _is_html_response(response) and super().should_cache_response(response, request)
+
+
+# Признаки CAPTCHA находятся в начале страницы (head и первые блоки body)
+_CAPTCHA_SCAN_LIMIT = 65536
+
+
+# Размер кольца заранее выбранных User-Agent/прокси; степень двойки — индекс берётся по маске
+_PICK_RING_SIZE = 1024
+
+
+def _crawling_config(crawler):
+    """Секция crawling из SNAPCRAWLER_CONFIG; вычисляется один раз и хранится на crawler"""
+    crawling_config = getattr(crawler, '_snapcrawler_crawling_config', None)
+    if crawling_config is None:
+        config = crawler.settings.get('SNAPCRAWLER_CONFIG') or {}
+        crawling_config = config.get('crawling') or {}
+        crawler._snapcrawler_crawling_config = crawling_config
+    return crawling_config
+
+
+def _keyword_automaton(keywords):
+    """Автомат Ахо-Корасик по ключевым словам в нижнем регистре — один проход по тексту"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
 class RotateUserAgentMiddleware:
     """
     Промежуточный слой (middleware) для ротации заголовка User-Agent на каждый запрос.
     """
 
     def __init__(self, user_agents):
-        self.user_agents = user_agents
+        # Заголовки хранятся в байтах (UTF-8, как в scrapy Headers): без кодирования на каждый запрос
+        self.user_agents = tuple(ua.encode('utf-8') if isinstance(ua, str) else ua for ua in user_agents)
+        # Кольцо случайных выборок: заполняется пачкой при каждом проходе по кругу
+        self._ua_ring = []
+        self._ua_i = 0
 
     @classmethod
     def from_crawler(cls, crawler):
         # Получаем список User-Agent из конфигурации
-        config = crawler.settings.get('SNAPCRAWLER_CONFIG', {})
-        user_agents = config.get('crawling', {}).get('user_agents', [])
+        user_agents = _crawling_config(crawler).get('user_agents', [])
         if not user_agents:
             return None
         return cls(user_agents)
 
     def process_request(self, request, spider):
         if self.user_agents:
-            request.headers.setdefault('User-Agent', random.choice(self.user_agents))
+            i = self._ua_i
+            if i == 0:
+                self._ua_ring = random.choices(self.user_agents, k=_PICK_RING_SIZE)
+            self._ua_i = (i + 1) & (_PICK_RING_SIZE - 1)
+            request.headers.setdefault(b'User-Agent', self._ua_ring[i])
 
 
 class ProxyMiddleware:
@@ -35,75 +132,217 @@ class ProxyMiddleware:
     """
 
     def __init__(self, proxies):
-        self.proxies = proxies
+        # Интернированные строки сравниваются дальше по идентичности
+        self.proxies = tuple(sys.intern(proxy) for proxy in proxies)
+        # Кольцо случайных выборок: заполняется пачкой при каждом проходе по кругу
+        self._proxy_ring = []
+        self._proxy_i = 0
 
     @classmethod
     def from_crawler(cls, crawler):
         # Включается только если в конфигурации задан список прокси
-        proxies = crawler.settings.get('SNAPCRAWLER_CONFIG', {}).get('crawling', {}).get('proxies')
+        proxies = _crawling_config(crawler).get('proxies')
         if not proxies:
             return None
         return cls(proxies)
 
     def process_request(self, request, spider):
         if self.proxies:
-            proxy = random.choice(self.proxies)
-            request.meta['proxy'] = proxy
+            i = self._proxy_i
+            if i == 0:
+                self._proxy_ring = random.choices(self.proxies, k=_PICK_RING_SIZE)
+            self._proxy_i = (i + 1) & (_PICK_RING_SIZE - 1)
+            request.meta['proxy'] = self._proxy_ring[i]
 
 
 class AdaptiveDelayMiddleware:
     """
     Промежуточный слой, динамически регулирующий задержки между запросами в зависимости от ответов сервера.
+    Задержка и ведро токенов ведутся отдельно для каждого домена: медленный хост не тормозит остальные.
+    Параллельность слота загрузчика регулируется по AIMD: +1 за каждое «окно» успешных ответов,
+    вдвое меньше при лимитировании или ошибке. Задержка растёт так же мультипликативно,
+    а при успехах снижается на постоянный шаг до начальной.
     """
     
-    def __init__(self, initial_delay=1.0, max_delay=30.0, backoff_factor=2.0):
+    def __init__(self, initial_delay=1.0, max_delay=30.0, backoff_factor=2.0, burst=1.0, delay_step=None):
         self.initial_delay = initial_delay
         self.max_delay = max_delay
         self.backoff_factor = backoff_factor
-        self.current_delay = initial_delay
-        self.consecutive_errors = 0
-        self.last_request_time = 0
+        self.burst = burst
+        self.delay_step = delay_step if delay_step is not None else initial_delay * 0.1
+        # Состояние по доменам (netloc)
+        self.current_delay = {}
+        self.consecutive_errors = {}
+        # Ведро токенов: (токены, время пополнения по time.monotonic)
+        self.buckets = {}
+        # Состояние AIMD по ключам слотов загрузчика: исходная параллельность и успехи в текущем окне
+        self.max_concurrency = {}
+        self.window_successes = {}
     
     @classmethod
     def from_crawler(cls, crawler):
-        config = crawler.settings.get('SNAPCRAWLER_CONFIG', {})
-        crawling_config = config.get('crawling', {})
+        crawling_config = _crawling_config(crawler)
         
         return cls(
             initial_delay=crawling_config.get('request_delay', 1.0),
             max_delay=crawling_config.get('max_delay', 30.0),
-            backoff_factor=crawling_config.get('backoff_factor', 2.0)
+            backoff_factor=crawling_config.get('backoff_factor', 2.0),
+            burst=crawling_config.get('delay_burst', 1.0),
+            delay_step=crawling_config.get('delay_decrease_step')
         )
     
-    def process_request(self, request, spider):
-        # Реализуем адаптивную задержку между запросами
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
+    async def process_request(self, request, spider):
+        # Реализуем адаптивную задержку между запросами к одному домену.
+        # Ожидание не блокирует реактор: остальные запросы идут параллельно
+        domain = urlparse(request.url).netloc
+        delay = self.current_delay.get(domain, self.initial_delay)
+        current_time = time.monotonic()
         
-        if time_since_last < self.current_delay:
-            time.sleep(self.current_delay - time_since_last)
+        # Пополняем ведро со скоростью 1/delay токенов в секунду и сразу
+        # забираем токен: отрицательный остаток — очередь ожидающих запросов
+        tokens, last_refill = self.buckets.get(domain, (self.burst, current_time))
+        if delay > 0:
+            tokens = min(self.burst, tokens + (current_time - last_refill) / delay)
+        else:
+            tokens = self.burst
+        tokens -= 1
+        self.buckets[domain] = (tokens, current_time)
         
-        self.last_request_time = time.time()
+        if tokens < 0:
+            await asyncio.sleep(-tokens * delay)
     
     def process_response(self, request, response, spider):
-        # Корректируем задержку на основе ответа сервера
+        # Корректируем задержку домена на основе ответа сервера
+        domain = urlparse(request.url).netloc
+        delay = self.current_delay.get(domain, self.initial_delay)
         if response.status == 200:
-            # Успех — постепенно уменьшаем задержку
-            self.consecutive_errors = 0
-            self.current_delay = max(self.initial_delay, self.current_delay * 0.9)
+            # Успех — уменьшаем задержку на постоянный шаг, параллельность растёт на 1 за окно
+            self.consecutive_errors[domain] = 0
+            self.current_delay[domain] = max(self.initial_delay, delay - self.delay_step)
+            self._adjust_concurrency(request, spider, throttled=False)
         elif response.status in [429, 503, 502, 504]:  # Лимитирование или ошибки сервера
-            # Увеличиваем задержку экспоненциально
-            self.consecutive_errors += 1
-            self.current_delay = min(self.max_delay, self.current_delay * self.backoff_factor)
-            spider.logger.warning(format_process_status('throttle', f"{format_url_short(response.url)} задержка {self.current_delay:.1f}с"))
+            # Увеличиваем задержку экспоненциально, параллельность уменьшаем вдвое
+            self.consecutive_errors[domain] = self.consecutive_errors.get(domain, 0) + 1
+            self.current_delay[domain] = min(self.max_delay, delay * self.backoff_factor)
+            self._adjust_concurrency(request, spider, throttled=True)
+            if spider.logger.isEnabledFor(logging.WARNING):
+                spider.logger.warning(format_process_status('throttle', f"{format_url_short(response.url)} задержка {self.current_delay[domain]:.1f}с"))
         
         return response
     
     def process_exception(self, request, exception, spider):
         # Обработка ошибок соединения
-        self.consecutive_errors += 1
-        self.current_delay = min(self.max_delay, self.current_delay * self.backoff_factor)
-        spider.logger.warning(format_process_status('connection_error', f"задержка {self.current_delay:.1f}с"))
+        domain = urlparse(request.url).netloc
+        self.consecutive_errors[domain] = self.consecutive_errors.get(domain, 0) + 1
+        self.current_delay[domain] = min(self.max_delay, self.current_delay.get(domain, self.initial_delay) * self.backoff_factor)
+        self._adjust_concurrency(request, spider, throttled=True)
+        if spider.logger.isEnabledFor(logging.WARNING):
+            spider.logger.warning(format_process_status('connection_error', f"задержка {self.current_delay[domain]:.1f}с"))
+    
+    def _adjust_concurrency(self, request, spider, throttled):
+        """AIMD для слота загрузчика Scrapy, через который прошёл запрос"""
+        engine = getattr(getattr(spider, 'crawler', None), 'engine', None)
+        downloader = getattr(engine, 'downloader', None)
+        if downloader is None:
+            return
+        key = downloader.get_slot_key(request)
+        slot = downloader.slots.get(key)
+        if slot is None:
+            return
+        
+        # Исходная параллельность слота (CONCURRENT_REQUESTS_PER_DOMAIN/IP) — верхняя граница
+        max_concurrency = self.max_concurrency.setdefault(key, slot.concurrency)
+        if throttled:
+            slot.concurrency = max(1, slot.concurrency // 2)
+            self.window_successes[key] = 0
+            return
+        
+        successes = self.window_successes.get(key, 0) + 1
+        if successes >= slot.concurrency:
+            slot.concurrency = min(max_concurrency, slot.concurrency + 1)
+            successes = 0
+        self.window_successes[key] = successes
+
+
+class RequestCoalescingMiddleware:
+    """
+    Промежуточный слой, объединяющий одновременные запросы к одному и тому же URL.
+    Пока первый запрос в полёте, повторные (метод, URL, тело и режим загрузки совпадают) ждут
+    его ответа и получают копию вместо собственной загрузки. Планировщик Scrapy отсеивает
+    дубликаты заранее, поэтому сюда доходят в основном запросы с dont_filter и повторы после ошибок.
+    
+    Запрос считается «в полёте» только с момента, когда он дошёл до загрузчика
+    (сигнал request_reached_downloader): запрос, заменённый или отброшенный другим
+    middleware раньше, ключ не занимает.
+    """
+    
+    def __init__(self, wait_timeout=180.0):
+        self.wait_timeout = wait_timeout
+        # Ключ запроса -> (первый запрос, future с его ответом или None при ошибке)
+        self._inflight = {}
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(wait_timeout=crawler.settings.getfloat('DOWNLOAD_TIMEOUT', 180.0))
+        crawler.signals.connect(middleware.request_reached_downloader, signal=signals.request_reached_downloader)
+        return middleware
+    
+    @staticmethod
+    def _request_key(request):
+        # Отрисованный браузером и обычный ответ на один URL различаются
+        meta = request.meta
+        return (request.method, request.url, request.body,
+                bool(meta.get('playwright')), meta.get('playwright_context'),
+                bool(meta.get('dont_cache')))
+    
+    @staticmethod
+    def _coalescible(request):
+        # Страница Playwright (playwright_include_page) есть только у своего запроса
+        return not request.meta.get('playwright_include_page')
+    
+    def request_reached_downloader(self, request, spider):
+        if self._coalescible(request):
+            key = self._request_key(request)
+            if key not in self._inflight:
+                self._inflight[key] = (request, asyncio.get_running_loop().create_future())
+    
+    async def process_request(self, request, spider):
+        if not self._coalescible(request):
+            return None
+        key = self._request_key(request)
+        entry = self._inflight.get(key)
+        if entry is None:
+            return None
+        
+        first_request, future = entry
+        if first_request is request:
+            return None
+        try:
+            response = await asyncio.wait_for(asyncio.shield(future), self.wait_timeout)
+        except asyncio.TimeoutError:
+            # Ответ так и не пришёл — освобождаем ключ и загружаем самостоятельно
+            self._resolve(first_request, None)
+            return None
+        if response is None:
+            # Первый запрос завершился ошибкой — загружаем самостоятельно
+            return None
+        return response.replace(request=request)
+    
+    def _resolve(self, request, response):
+        key = self._request_key(request)
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is request:
+            del self._inflight[key]
+            if not entry[1].done():
+                entry[1].set_result(response)
+    
+    def process_response(self, request, response, spider):
+        self._resolve(request, response)
+        return response
+    
+    def process_exception(self, request, exception, spider):
+        # Ожидающие запросы освобождаются сразу и загружают сами
+        self._resolve(request, None)
 
 
 class CaptchaDetectionMiddleware:
@@ -117,17 +356,23 @@ class CaptchaDetectionMiddleware:
             'captcha', 'recaptcha', 'hcaptcha', 'cloudflare',
             'please verify', 'human verification', 'robot check'
         ]
+        self._captcha_automaton = _keyword_automaton(self.captcha_indicators)
+        # Байтовое выражение с IGNORECASE сравнивает только ASCII и не копирует тело
+        self._captcha_regex = re.compile(
+            b'|'.join(re.escape(indicator.encode()) for indicator in self.captcha_indicators),
+            re.IGNORECASE
+        )
     
     @classmethod
     def from_crawler(cls, crawler):
-        config = crawler.settings.get('SNAPCRAWLER_CONFIG', {})
-        api_key = config.get('crawling', {}).get('captcha_api_key')
+        api_key = _crawling_config(crawler).get('captcha_api_key')
         return cls(captcha_service_api_key=api_key)
     
     def process_response(self, request, response, spider):
         # Проверяем, содержит ли ответ страницу с CAPTCHA
         if self.is_captcha_response(response):
-            spider.logger.warning(format_process_status('captcha', format_url_short(request.url)))
+            if spider.logger.isEnabledFor(logging.WARNING):
+                spider.logger.warning(format_process_status('captcha', format_url_short(request.url)))
             
             if self.captcha_service_api_key:
                 # Пытаемся решить CAPTCHA (базовая заглушка)
@@ -136,7 +381,8 @@ class CaptchaDetectionMiddleware:
                     return solved_response
             
             # Если решить не удалось — пропускаем/повторим позже с увеличенной задержкой
-            spider.logger.warning(format_process_status('skip', f"CAPTCHA {format_url_short(request.url)}"))
+            if spider.logger.isEnabledFor(logging.WARNING):
+                spider.logger.warning(format_process_status('skip', f"CAPTCHA {format_url_short(request.url)}"))
             raise IgnoreRequest(f"Требование CAPTCHA на {request.url}")
         
         return response
@@ -146,14 +392,24 @@ class CaptchaDetectionMiddleware:
         if response.status == 403:
             return True
         
-        content_lower = response.text.lower()
-        return any(indicator in content_lower for indicator in self.captcha_indicators)
+        # Изображения и прочие бинарные ответы не сканируются
+        if _is_binary_response(response):
+            return False
+        
+        # Признаки — ASCII, поэтому тело проверяется как байты, без декодирования;
+        # сканируются только первые _CAPTCHA_SCAN_LIMIT байт
+        body = response.body
+        if self._captcha_automaton is not None:
+            head = body[:_CAPTCHA_SCAN_LIMIT].lower().decode('latin-1')
+            return next(self._captcha_automaton.iter(head), None) is not None
+        return self._captcha_regex.search(body, 0, _CAPTCHA_SCAN_LIMIT) is not None
     
     def solve_captcha(self, request, response, spider):
         """Базовая заглушка для решения CAPTCHA через внешний сервис"""
         # Это заглушка под интеграцию решения CAPTCHA
         # Реальная реализация интегрируется с 2captcha, AntiCaptcha и т.п.
-        spider.logger.info(format_process_status('processing', "CAPTCHA сервис не настроен"))
+        if spider.logger.isEnabledFor(logging.INFO):
+            spider.logger.info(format_process_status('processing', "CAPTCHA сервис не настроен"))
         return None
 
 
@@ -167,30 +423,41 @@ class AjaxInterceptorMiddleware:
             '/api/', '/ajax/', '/json/', '/load', '/fetch',
             'xhr', 'async', 'infinite', 'scroll', 'more'
         ]
+        self._ajax_automaton = _keyword_automaton(self.ajax_patterns)
+        self._ajax_regex = re.compile('|'.join(re.escape(pattern) for pattern in self.ajax_patterns))
     
     @classmethod
     def from_crawler(cls, crawler):
         return cls()
     
     def process_response(self, request, response, spider):
+        # Бинарные ответы (в основном сами изображения) не разбираются
+        if _is_binary_response(response):
+            return response
+        
+        # Колбэк сам разбирает JSON или изображения уже извлечены — повторно не ищем
+        if request.meta.get('skip_ajax_extract') or '_ajax_images' in request.meta:
+            return response
+        
         # Проверяем, является ли ответом Ajax/API
         if self.is_ajax_response(request, response):
             # Извлекаем ссылки на изображения из JSON/Ajax-ответа
             images = self.extract_images_from_ajax(response, spider)
             if images:
-                spider.logger.info(format_process_status('success', f"{len(images)} изображений из Ajax {format_url_short(request.url)}"))
-                # Создаём Item для найденных изображений
-                from ..items import SnapcrawlerItem
-                item = SnapcrawlerItem()
-                item['image_urls'] = images
-                # Примечание: дальше нужно отдавать через колбэк паука (yield)
+                if spider.logger.isEnabledFor(logging.INFO):
+                    spider.logger.info(format_process_status('success', f"{len(images)} изображений из Ajax {format_url_short(request.url)}"))
+                # Паук забирает их из response.meta (это meta запроса) вместе с остальными изображениями
+                request.meta['_ajax_images'] = images
         
         return response
     
     def is_ajax_response(self, request, response):
         """Проверяет, относится ли ответ к запросу Ajax/API"""
         url_lower = request.url.lower()
-        if any(pattern in url_lower for pattern in self.ajax_patterns):
+        if self._ajax_automaton is not None:
+            if next(self._ajax_automaton.iter(url_lower), None) is not None:
+                return True
+        elif self._ajax_regex.search(url_lower):
             return True
         
         # Проверяем тип содержимого (Content-Type)
@@ -206,44 +473,85 @@ class AjaxInterceptorMiddleware:
     
     def extract_images_from_ajax(self, response, spider):
         """Извлекает URL изображений из Ajax/JSON-ответа"""
-        images = []
+        # Множество: дубликаты отбрасываются сразу при сборе
+        images = set()
         
         try:
-            import json
-            import re
-            
-            # Пробуем распарсить как JSON
+            # Пробуем разобрать как JSON: потоково через ijson, если он установлен.
+            # Тело разбирается прямо из байтов; ValueError покрывает ошибки json, orjson
+            # и UnicodeDecodeError для тела не в UTF-8
+            json_errors = (ValueError, ijson.JSONError) if ijson is not None else ValueError
             try:
-                data = json.loads(response.text)
-                images.extend(self.extract_from_json_recursive(data))
-            except json.JSONDecodeError:
+                if ijson is not None:
+                    images = self.extract_from_json_stream(response.body)
+                else:
+                    data = orjson.loads(response.body) if orjson is not None else json.loads(response.body)
+                    images = self.extract_from_json_recursive(data)
+            except json_errors:
                 # Если это не JSON, ищем URL изображений в тексте
-                image_pattern = r'https?://[^\s"\'>]+\.(?:jpg|jpeg|png|gif|webp|svg)(?:\?[^\s"\'>]*)?'
-                found_urls = re.findall(image_pattern, response.text, re.IGNORECASE)
-                images.extend(found_urls)
+                encoding = getattr(response, 'encoding', None) or 'utf-8'
+                images = {url.decode(encoding, 'replace') for url in _IMG_RE.findall(response.body)}
         
         except Exception as e:
             spider.logger.error(format_process_status('error', f"Ajax: {str(e)[:30]}"))
         
-        return list(set(images))  # Убираем дубликаты
+        return list(images)
+    
+    def extract_from_json_stream(self, body):
+        """Извлекает URL изображений из JSON потоком событий ijson, не строя дерево
+        
+        Правила те же, что в extract_from_json_recursive: проверяются строки под
+        ключами из _JSON_IMAGE_KEYS и элементы массивов, а контейнеры под такими
+        ключами не обходятся. При ошибке разбора исключение ijson пробрасывается.
+        """
+        images = set()
+        # Открытые контейнеры: (это массив, содержимое пропускается)
+        frames = []
+        key = None
+        
+        for _, event, value in ijson.parse(io.BytesIO(body)):
+            if event == 'map_key':
+                key = value
+                continue
+            
+            if event == 'end_map' or event == 'end_array':
+                frames.pop()
+                continue
+            
+            in_array, skipped = frames[-1] if frames else (False, False)
+            # Ключ есть только у значений внутри объекта; у пустого объекта его нет вовсе
+            image_key = (bool(frames) and not in_array and key is not None
+                         and key.lower() in _JSON_IMAGE_KEYS)
+            
+            if event == 'start_map' or event == 'start_array':
+                frames.append((event == 'start_array', skipped or image_key))
+                if event == 'start_map':
+                    key = None
+            elif event == 'string' and not skipped:
+                if (not frames or in_array or image_key) and self.is_image_url(value):
+                    images.add(value)
+        
+        return images
     
     def extract_from_json_recursive(self, data):
-        """Рекурсивно извлекает URL изображений из JSON-структуры"""
-        images = []
+        """Извлекает URL изображений из JSON-структуры обходом с явным стеком"""
+        images = set()
+        is_image_url = self.is_image_url
         
-        if isinstance(data, dict):
-            for key, value in data.items():
-                key_lower = key.lower()
-                if key_lower in ['image', 'img', 'photo', 'picture', 'thumbnail', 'src', 'url']:
-                    if isinstance(value, str) and self.is_image_url(value):
-                        images.append(value)
-                elif isinstance(value, (dict, list)):
-                    images.extend(self.extract_from_json_recursive(value))
-        elif isinstance(data, list):
-            for item in data:
-                images.extend(self.extract_from_json_recursive(item))
-        elif isinstance(data, str) and self.is_image_url(data):
-            images.append(data)
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    if key.lower() in _JSON_IMAGE_KEYS:
+                        if isinstance(value, str) and is_image_url(value):
+                            images.add(value)
+                    elif isinstance(value, (dict, list)):
+                        stack.append(value)
+            elif isinstance(node, list):
+                stack.extend(node)
+            elif isinstance(node, str) and is_image_url(node):
+                images.add(node)
         
         return images
     
@@ -252,6 +560,5 @@ class AjaxInterceptorMiddleware:
         if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
             return False
         
-        image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.bmp']
         url_lower = url.lower()
-        return any(ext in url_lower for ext in image_extensions)
+        return any(ext in url_lower for ext in _IMAGE_EXTENSIONS)
@@ -1,16 +1,102 @@
 """
 Продвинутые middleware для обхода современных анти-скрапинг защит
 """
+import asyncio
 import random
-import time
+import re
 import json
 import hashlib
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Final, Optional
 from scrapy.downloadermiddlewares.useragent import UserAgentMiddleware
 from scrapy.exceptions import NotConfigured
+from scrapy.utils.misc import load_object
 from scrapy_playwright.page import PageMethod
 
 
+# Общие меры против детекции автоматизации: скрипт не зависит от конфигурации браузера
+_ANTI_DETECTION_SCRIPT: Final[str] = '''
+        () => {
+            // Убираем следы автоматизации
+            delete window.cdc_adoQpoasnfa76pfcZLmcfl_Array;
+            delete window.cdc_adoQpoasnfa76pfcZLmcfl_Promise;
+            delete window.cdc_adoQpoasnfa76pfcZLmcfl_Symbol;
+            
+            // Маскируем Playwright/Puppeteer
+            Object.defineProperty(window, 'chrome', {
+                get: () => ({
+                    runtime: {},
+                    loadTimes: function() {},
+                    csi: function() {},
+                    app: {}
+                })
+            });
+            
+            // Эмулируем нормальное поведение браузера
+            Object.defineProperty(navigator, 'permissions', {
+                get: () => ({
+                    query: () => Promise.resolve({ state: 'granted' })
+                })
+            });
+            
+            // Добавляем реалистичные события
+            ['mousedown', 'mouseup', 'mousemove'].forEach(eventType => {
+                document.addEventListener(eventType, () => {}, { passive: true });
+            });
+            
+            // Эмулируем активность пользователя
+            let lastActivity = Date.now();
+            const updateActivity = () => {
+                lastActivity = Date.now();
+            };
+            
+            ['click', 'scroll', 'keydown', 'mousemove', 'touchstart'].forEach(event => {
+                document.addEventListener(event, updateActivity, { passive: true });
+            });
+            
+            // Переопределяем Date для стабильности
+            const originalDate = Date;
+            const timeOffset = Math.floor(Math.random() * 1000);
+            
+            window.Date = class extends originalDate {
+                constructor(...args) {
+                    if (args.length === 0) {
+                        super(originalDate.now() + timeOffset);
+                    } else {
+                        super(...args);
+                    }
+                }
+                
+                static now() {
+                    return originalDate.now() + timeOffset;
+                }
+            };
+        }
+        '''
+
+
+def add_page_init_script(request, script: str) -> None:
+    """
+    Ставит скрипт на страницу Playwright через add_init_script до навигации.
+    Уже заданный playwright_page_init_callback (например, эмуляции) сохраняется и вызывается первым.
+    """
+    previous = request.meta.get('playwright_page_init_callback')
+    if isinstance(previous, str):
+        previous = load_object(previous)
+    
+    async def init_page(page, request):
+        if previous is not None:
+            await previous(page, request)
+        await page.add_init_script(script=script)
+    
+    request.meta['playwright_page_init_callback'] = init_page
+
+
+def bundle_init_script(scripts) -> str:
+    """Склеивает JS-функции вида () => {...} в один init-скрипт, вызывающий их по очереди"""
+    calls = '\n'.join(f'({script.strip()})();' for script in scripts)
+    return f'(() => {{\n{calls}\n}})();'
+
+
 class AdvancedFingerprintSpoofingMiddleware:
     """Продвинутый спуфинг браузерных отпечатков для обхода AI-детекции"""
     
@@ -55,6 +141,9 @@ class AdvancedFingerprintSpoofingMiddleware:
             }
         ]
         
+        # Скрипты собираются один раз на конфигурацию; шум Canvas/Audio фиксируется на сессию
+        self._compiled_scripts = [self._compile_scripts(config) for config in self.browser_configs]
+        
     @classmethod
     def from_crawler(cls, crawler):
         settings = crawler.settings
@@ -70,74 +159,80 @@ class AdvancedFingerprintSpoofingMiddleware:
     
     def _configure_advanced_spoofing(self, request):
         """Настраивает продвинутый спуфинг для Playwright"""
-        config = random.choice(self.browser_configs)
+        scripts = random.choice(self._compiled_scripts)
         page_methods = request.meta.get('playwright_page_methods', [])
         
-        # Базовая конфигурация браузера
+        # Timezone и viewport задаются через API Playwright
         page_methods.extend([
-            # Спуфинг navigator properties
-            PageMethod('evaluate', f'''
-                () => {{
-                    // Переопределяем navigator properties
-                    Object.defineProperty(navigator, 'platform', {{
-                        get: () => '{config["platform"]}'
-                    }});
-                    
-                    Object.defineProperty(navigator, 'hardwareConcurrency', {{
-                        get: () => {config["hardwareConcurrency"]}
-                    }});
-                    
-                    Object.defineProperty(navigator, 'deviceMemory', {{
-                        get: () => {config["deviceMemory"]}
-                    }});
-                    
-                    Object.defineProperty(navigator, 'languages', {{
-                        get: () => {json.dumps(config["languages"])}
-                    }});
-                    
-                    // Убираем webdriver флаг
-                    Object.defineProperty(navigator, 'webdriver', {{
-                        get: () => undefined
-                    }});
-                    
-                    // Добавляем реалистичные плагины
-                    Object.defineProperty(navigator, 'plugins', {{
-                        get: () => [
-                            {{name: 'Chrome PDF Plugin', filename: 'internal-pdf-viewer'}},
-                            {{name: 'Chromium PDF Plugin', filename: 'mhjfbmdgcfjbbpaeojofohoefgiehjai'}},
-                            {{name: 'Microsoft Edge PDF Plugin', filename: 'pdf.js'}},
-                            {{name: 'WebKit built-in PDF', filename: 'WebKit built-in PDF'}}
-                        ]
-                    }});
-                }}
-            '''),
-            
-            # Установка timezone
-            PageMethod('emulate_timezone', config['timezone']),
-            
-            # Установка viewport
-            PageMethod('set_viewport_size', {
-                'width': config['screen']['width'],
-                'height': config['screen']['height']
-            }),
+            PageMethod('emulate_timezone', scripts['timezone']),
+            PageMethod('set_viewport_size', dict(scripts['viewport'])),
         ])
+        request.meta['playwright_page_methods'] = page_methods
         
+        # Спуфинг navigator, Canvas, WebGL, Audio и анти-детекция — одним init-скриптом:
+        # он выполняется до скриптов страницы и без отдельного evaluate на каждую часть
+        add_page_init_script(request, scripts['init'])
+    
+    def _compile_scripts(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Собирает все скрипты спуфинга для одной конфигурации браузера"""
+        scripts = [self._get_navigator_spoofing_script(config)]
         # Canvas fingerprint spoofing
         if self.canvas_noise and self.fingerprint_level == 'high':
-            page_methods.append(PageMethod('evaluate', self._get_canvas_spoofing_script()))
-        
+            scripts.append(self._get_canvas_spoofing_script())
         # WebGL fingerprint spoofing
         if self.webgl_spoofing:
-            page_methods.append(PageMethod('evaluate', self._get_webgl_spoofing_script(config)))
-        
+            scripts.append(self._get_webgl_spoofing_script(config))
         # Audio context spoofing
         if self.audio_spoofing and self.fingerprint_level == 'high':
-            page_methods.append(PageMethod('evaluate', self._get_audio_spoofing_script()))
-        
-        # Общие анти-детекция меры
-        page_methods.append(PageMethod('evaluate', self._get_anti_detection_script()))
+            scripts.append(self._get_audio_spoofing_script())
+        scripts.append(_ANTI_DETECTION_SCRIPT)
         
-        request.meta['playwright_page_methods'] = page_methods
+        return {
+            'init': bundle_init_script(scripts),
+            'timezone': config['timezone'],
+            'viewport': {
+                'width': config['screen']['width'],
+                'height': config['screen']['height']
+            },
+        }
+    
+    def _get_navigator_spoofing_script(self, config: Dict[str, Any]) -> str:
+        """JavaScript для спуфинга свойств navigator"""
+        return f'''
+        () => {{
+            // Переопределяем navigator properties
+            Object.defineProperty(navigator, 'platform', {{
+                get: () => '{config["platform"]}'
+            }});
+            
+            Object.defineProperty(navigator, 'hardwareConcurrency', {{
+                get: () => {config["hardwareConcurrency"]}
+            }});
+            
+            Object.defineProperty(navigator, 'deviceMemory', {{
+                get: () => {config["deviceMemory"]}
+            }});
+            
+            Object.defineProperty(navigator, 'languages', {{
+                get: () => {json.dumps(config["languages"])}
+            }});
+            
+            // Убираем webdriver флаг
+            Object.defineProperty(navigator, 'webdriver', {{
+                get: () => undefined
+            }});
+            
+            // Добавляем реалистичные плагины
+            Object.defineProperty(navigator, 'plugins', {{
+                get: () => [
+                    {{name: 'Chrome PDF Plugin', filename: 'internal-pdf-viewer'}},
+                    {{name: 'Chromium PDF Plugin', filename: 'mhjfbmdgcfjbbpaeojofohoefgiehjai'}},
+                    {{name: 'Microsoft Edge PDF Plugin', filename: 'pdf.js'}},
+                    {{name: 'WebKit built-in PDF', filename: 'WebKit built-in PDF'}}
+                ]
+            }});
+        }}
+        '''
     
     def _get_canvas_spoofing_script(self) -> str:
         """JavaScript для спуфинга Canvas fingerprint"""
@@ -282,67 +377,6 @@ class AdvancedFingerprintSpoofingMiddleware:
             }}
         }}
         '''
-    
-    def _get_anti_detection_script(self) -> str:
-        """JavaScript для общих мер против детекции автоматизации"""
-        return '''
-        () => {
-            // Убираем следы автоматизации
-            delete window.cdc_adoQpoasnfa76pfcZLmcfl_Array;
-            delete window.cdc_adoQpoasnfa76pfcZLmcfl_Promise;
-            delete window.cdc_adoQpoasnfa76pfcZLmcfl_Symbol;
-            
-            // Маскируем Playwright/Puppeteer
-            Object.defineProperty(window, 'chrome', {
-                get: () => ({
-                    runtime: {},
-                    loadTimes: function() {},
-                    csi: function() {},
-                    app: {}
-                })
-            });
-            
-            // Эмулируем нормальное поведение браузера
-            Object.defineProperty(navigator, 'permissions', {
-                get: () => ({
-                    query: () => Promise.resolve({ state: 'granted' })
-                })
-            });
-            
-            // Добавляем реалистичные события
-            ['mousedown', 'mouseup', 'mousemove'].forEach(eventType => {
-                document.addEventListener(eventType, () => {}, { passive: true });
-            });
-            
-            // Эмулируем активность пользователя
-            let lastActivity = Date.now();
-            const updateActivity = () => {
-                lastActivity = Date.now();
-            };
-            
-            ['click', 'scroll', 'keydown', 'mousemove', 'touchstart'].forEach(event => {
-                document.addEventListener(event, updateActivity, { passive: true });
-            });
-            
-            // Переопределяем Date для стабильности
-            const originalDate = Date;
-            const timeOffset = Math.floor(Math.random() * 1000);
-            
-            window.Date = class extends originalDate {
-                constructor(...args) {
-                    if (args.length === 0) {
-                        super(originalDate.now() + timeOffset);
-                    } else {
-                        super(...args);
-                    }
-                }
-                
-                static now() {
-                    return originalDate.now() + timeOffset;
-                }
-            };
-        }
-        '''
 
 
 class SmartThrottlingMiddleware:
@@ -365,14 +399,14 @@ class SmartThrottlingMiddleware:
             raise NotConfigured('SmartThrottlingMiddleware disabled')
         return cls(settings)
     
-    def process_request(self, request, spider):
-        """Применяет умную задержку перед запросом"""
+    async def process_request(self, request, spider):
+        """Применяет умную задержку перед запросом (не блокируя реактор)"""
         domain = self._get_domain(request.url)
         base_delay = self.settings.get('SNAPCRAWLER_CONFIG', {}).get('crawling', {}).get('delays', {}).get('base_delay', self.base_delay)
         delay = self.domain_delays.get(domain, base_delay)
         
         if delay > 0:
-            time.sleep(delay)
+            await asyncio.sleep(delay)
         
         return None
     
@@ -425,6 +459,14 @@ class SmartThrottlingMiddleware:
 class CaptchaSolverMiddleware:
     """Middleware для автоматического решения CAPTCHA"""
     
+    # Все признаки — одним байтовым выражением: один проход по телу без декодирования и .lower()
+    _CAPTCHA_RE = re.compile(
+        rb'captcha|recaptcha|hcaptcha|cloudflare|challenge|verification|robot',
+        re.IGNORECASE
+    )
+    # Признаки CAPTCHA находятся в начале страницы; дальше тело не сканируется
+    _SCAN_LIMIT = 65536
+    
     def __init__(self, settings):
         self.settings = settings
         self.api_key = settings.get('CAPTCHA_API_KEY', '')
@@ -456,13 +498,12 @@ class CaptchaSolverMiddleware:
     
     def _is_captcha_response(self, response) -> bool:
         """Определяет, содержит ли ответ CAPTCHA"""
-        captcha_indicators = [
-            'captcha', 'recaptcha', 'hcaptcha', 'cloudflare',
-            'challenge', 'verification', 'robot'
-        ]
+        # CAPTCHA отдаётся HTML-страницей; JSON, изображения и прочее не проверяются
+        content_type = (response.headers.get(b'Content-Type') or b'').lower()
+        if content_type and b'html' not in content_type:
+            return False
         
-        content_lower = response.text.lower()
-        return any(indicator in content_lower for indicator in captcha_indicators)
+        return self._CAPTCHA_RE.search(response.body, 0, self._SCAN_LIMIT) is not None
     
     def _solve_captcha(self, response, spider) -> Optional[str]:
         """Решает CAPTCHA через внешний сервис"""
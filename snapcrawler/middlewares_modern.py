@@ -1,12 +1,34 @@
 """
 Современные middleware для обхода анти-скрапинг защит
 """
+import asyncio
 import random
 import time
 from scrapy.downloadermiddlewares.useragent import UserAgentMiddleware
 from scrapy.exceptions import NotConfigured
 
 
+# Отключение WebRTC и маскировка автоматизации; ставится через add_init_script
+_STEALTH_INIT_SCRIPT = '''
+(() => {
+    // Отключаем WebRTC
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined,
+    });
+    
+    // Маскируем автоматизацию
+    window.chrome = {
+        runtime: {},
+    };
+    
+    // Эмулируем плагины
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5],
+    });
+})();
+'''
+
+
 class ModernStealthMiddleware:
     """Современный stealth middleware с продвинутыми техниками обхода"""
     
@@ -31,7 +53,7 @@ class ModernStealthMiddleware:
             raise NotConfigured('ModernStealthMiddleware disabled')
         return cls(settings)
     
-    def process_request(self, request, spider):
+    async def process_request(self, request, spider):
         """Применяет stealth техники к запросу"""
         
         # Рандомизация заголовков
@@ -40,8 +62,8 @@ class ModernStealthMiddleware:
         # Добавление реалистичных заголовков
         self._add_realistic_headers(request)
         
-        # Рандомизация времени запроса
-        self._add_timing_variation()
+        # Рандомизация времени запроса: ожидание не блокирует реактор
+        await asyncio.sleep(self._add_timing_variation())
         
         # Playwright-специфичные настройки
         if request.meta.get('playwright'):
@@ -83,18 +105,18 @@ class ModernStealthMiddleware:
         # Accept
         headers['Accept'] = 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8'
     
-    def _add_timing_variation(self):
-        """Добавляет вариацию в тайминг запросов"""
+    def _add_timing_variation(self) -> float:
+        """Возвращает случайную задержку для вариации тайминга запросов"""
         # Небольшая случайная задержка
         config = getattr(self, 'config', {})
         min_delay = config.get('crawling', {}).get('delays', {}).get('min_random_delay', 0.1)
         max_delay = config.get('crawling', {}).get('delays', {}).get('max_random_delay', 0.5)
-        delay = random.uniform(min_delay, max_delay)
-        time.sleep(delay)
+        return random.uniform(min_delay, max_delay)
     
     def _configure_playwright_stealth(self, request):
         """Настраивает stealth параметры для Playwright"""
         from scrapy_playwright.page import PageMethod
+        from .middlewares_advanced import add_page_init_script
         
         # Получаем существующие методы или создаем новые
         page_methods = request.meta.get('playwright_page_methods', [])
@@ -120,29 +142,10 @@ class ModernStealthMiddleware:
             PageMethod('emulate_timezone', random.choice(timezones))
         )
         
-        # Отключение WebRTC для предотвращения утечки IP
-        page_methods.append(
-            PageMethod('evaluate', '''
-                () => {
-                    // Отключаем WebRTC
-                    Object.defineProperty(navigator, 'webdriver', {
-                        get: () => undefined,
-                    });
-                    
-                    // Маскируем автоматизацию
-                    window.chrome = {
-                        runtime: {},
-                    };
-                    
-                    // Эмулируем плагины
-                    Object.defineProperty(navigator, 'plugins', {
-                        get: () => [1, 2, 3, 4, 5],
-                    });
-                }
-            ''')
-        )
-        
         request.meta['playwright_page_methods'] = page_methods
+        
+        # Маскировка автоматизации — init-скриптом до скриптов страницы, без отдельного evaluate
+        add_page_init_script(request, _STEALTH_INIT_SCRIPT)
 
 
 class EnhancedUserAgentMiddleware(UserAgentMiddleware):
@@ -193,10 +196,11 @@ class AntiDetectionMiddleware:
         self.last_request_time = 0
         self.config = settings.get('SNAPCRAWLER_CONFIG', {}) if settings else {}
     
-    def process_request(self, request, spider):
+    async def process_request(self, request, spider):
         """Применяет техники против обнаружения"""
         self.request_count += 1
-        current_time = time.time()
+        # Интервал между запросами меряем монотонными часами: перевод системного времени его не искажает
+        current_time = time.monotonic()
         
         # Адаптивная задержка на основе частоты запросов
         if self.last_request_time > 0:
@@ -206,7 +210,7 @@ class AntiDetectionMiddleware:
                 min_delay = config.get('crawling', {}).get('delays', {}).get('min_request_delay', 1.0)
                 max_delay = config.get('crawling', {}).get('delays', {}).get('max_request_delay', 3.0)
                 delay = random.uniform(min_delay, max_delay)
-                time.sleep(delay)
+                await asyncio.sleep(delay)
         
         self.last_request_time = current_time
         
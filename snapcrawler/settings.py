@@ -78,12 +78,37 @@ if SNAPCRAWLER_CONFIG.get('crawling', {}).get('stealth_mode', True):
     DOWNLOADER_MIDDLEWARES['snapcrawler.middlewares_modern.EnhancedUserAgentMiddleware'] = 460
     DOWNLOADER_MIDDLEWARES['snapcrawler.middlewares_modern.AntiDetectionMiddleware'] = 470
 
+# Объединение одновременных запросов к одному URL. Стоит ближе всех к загрузчику:
+# ожидающие запросы получают исходный ответ и проходят всю цепочку process_response сами
+DOWNLOADER_MIDDLEWARES['snapcrawler.middlewares.RequestCoalescingMiddleware'] = 950
+
 # Всегда включаем RetryMiddleware для надёжности
 DOWNLOADER_MIDDLEWARES['scrapy.downloadermiddlewares.retry.RetryMiddleware'] = 480
 
 RETRY_TIMES = 3
 RETRY_HTTP_CODES = [500, 502, 503, 504, 408, 429]
 
+# ==============================================================================
+# HTTP-КЭШ (из config.yaml)
+# ==============================================================================
+
+HTTP_CACHE_CONFIG = config.get('crawling', {}).get('http_cache', {})
+HTTPCACHE_ENABLED = HTTP_CACHE_CONFIG.get('enabled', False)
+HTTPCACHE_EXPIRATION_SECS = HTTP_CACHE_CONFIG.get('expiration_secs', 86400)
+HTTPCACHE_DIR = HTTP_CACHE_CONFIG.get('dir', 'httpcache')
+HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
+# Блокировки и перегрузки не кэшируем, чтобы повторный запуск запросил их заново
+HTTPCACHE_IGNORE_HTTP_CODES = [403, 429, 500, 502, 503, 504]
+# В кэш попадают только HTML-страницы: тела изображений и прочих ответов не дублируются на диске
+if HTTP_CACHE_CONFIG.get('respect_cache_headers', False):
+    HTTPCACHE_POLICY = 'snapcrawler.middlewares.HtmlOnlyRFC2616Policy'
+else:
+    HTTPCACHE_POLICY = 'snapcrawler.middlewares.HtmlOnlyCachePolicy'
+
+# Кэш стоит раньше остальных посредников: попадание в кэш не проходит ротацию UA,
+# прокси и задержки, а страницы с CAPTCHA отбрасываются до сохранения в кэш
+DOWNLOADER_MIDDLEWARES['scrapy.downloadermiddlewares.httpcache.HttpCacheMiddleware'] = 100
+
 # ==============================================================================
 # ПРОДВИНУТЫЕ НАСТРОЙКИ STEALTH И ANTI-DETECTION
 # ==============================================================================
@@ -146,6 +171,16 @@ DOWNLOAD_HANDLERS = {
     "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
 }
 
+# Без браузера https-запросы могут идти через встроенный HTTP/2-обработчик Scrapy (нужен пакет h2):
+# одно TLS-соединение на хост вместо отдельного рукопожатия на каждое соединение HTTP/1.1.
+# Обработчик не поддерживает прокси, поэтому с ними остаётся HTTP/1.1.
+# Ограничение: обработчик не откатывается на HTTP/1.1 — https-сайты без поддержки HTTP/2 (ALPN h2)
+# завершатся ошибкой загрузки, поэтому опция выключена по умолчанию.
+# CONCURRENT_REQUESTS_PER_DOMAIN не меняется: параллельность на домен задаётся как обычно
+if (config['crawling'].get('http2', False) and not config['crawling']['js_enabled']
+        and not config['crawling'].get('proxies')):
+    DOWNLOAD_HANDLERS['https'] = 'scrapy.core.downloader.handlers.http2.H2DownloadHandler'
+
 PLAYWRIGHT_BROWSER_TYPE = 'chromium'
 PLAYWRIGHT_LAUNCH_OPTIONS = {
     'headless': True
@@ -4,7 +4,9 @@ import re
 from urllib.parse import urlparse
 from scrapy_playwright.page import PageMethod
 from snapcrawler.utils.log_formatter import format_process_status, format_url_short, format_stats_compact
-from snapcrawler.core.human_emulation import HumanEmulationModule, HiddenImageExtractor, NetworkTrafficCapture
+from snapcrawler.core.human_emulation import (
+    HumanEmulationModule, HiddenImageExtractor, NetworkTrafficCapture, CombinedBrowserEmulation
+)
 from snapcrawler.core.navigation_module import AutoNavigationManager
 from snapcrawler.core.advanced_formats import SmartImageProcessor
 from snapcrawler.items import SnapcrawlerItem
@@ -15,6 +17,9 @@ class ImageSpider(scrapy.Spider):
     Совместим с асинхронной архитектурой Scrapy 2.13+
     """
     name = 'image_spider'
+    
+    # Неизменяемые PageMethod, общие для всех запросов
+    _WAIT_NETWORKIDLE = PageMethod('wait_for_load_state', 'networkidle')
 
     def __init__(self, *args, **kwargs):
         super(ImageSpider, self).__init__(*args, **kwargs)
@@ -28,6 +33,7 @@ class ImageSpider(scrapy.Spider):
         self.human_emulation = None
         self.network_capture = None
         self.hidden_extractor = None
+        self.browser_emulation = None
         self.auto_navigation = None
         self.image_processor = None
 
@@ -70,6 +76,18 @@ class ImageSpider(scrapy.Spider):
         self.lazy_load_wait_time = float(crawling_cfg.get('lazy_load_wait_time', 0))
         self.detailed_tree_stats = bool(general_cfg.get('detailed_tree_stats', False))
         
+        # Ожидание ленивой загрузки одинаково для всех страниц
+        self._lazy_load_wait = None
+        if self.extract_lazy_loaded and self.lazy_load_wait_time > 0:
+            self._lazy_load_wait = PageMethod('wait_for_timeout', int(self.lazy_load_wait_time * 1000))
+        
+        # Все браузерные модули выполняются одним evaluate на страницу
+        self.browser_emulation = CombinedBrowserEmulation(
+            self.human_emulation,
+            self.network_capture if self.intercept_network_requests else None,
+            self.hidden_extractor,
+        )
+        
         self.logger.info(f"{format_process_status('crawl_start')} {len(start_urls)} источников, глубина={self.max_depth}")
         
         for url in start_urls:
@@ -77,10 +95,10 @@ class ImageSpider(scrapy.Spider):
             # Base Playwright methods
             page_methods = []
             if self.js_enabled:
-                page_methods.append(PageMethod('wait_for_load_state', 'networkidle'))
+                page_methods.append(self._WAIT_NETWORKIDLE)
                 # If we plan to rely on lazy loading, wait a bit for images to populate
-                if self.extract_lazy_loaded and self.lazy_load_wait_time > 0:
-                    page_methods.append(PageMethod('wait_for_timeout', int(self.lazy_load_wait_time * 1000)))
+                if self._lazy_load_wait:
+                    page_methods.append(self._lazy_load_wait)
 
             meta = {
                 'playwright': bool(page_methods),
@@ -89,7 +107,7 @@ class ImageSpider(scrapy.Spider):
             }
             yield scrapy.Request(url, callback=self.parse, meta=meta)
 
-    def parse(self, response):
+    async def parse(self, response):
         depth = response.meta.get('depth', 0)
         
         # --- Дедупликация страниц ---
@@ -138,23 +156,24 @@ class ImageSpider(scrapy.Spider):
                     # Создаем запрос с Playwright методами если нужно
                     page_methods = []
                     if self.config['crawling'].get('js_enabled', False):
-                        if self.intercept_network_requests:
-                            page_methods.extend(self._get_network_interception_methods())
-                        page_methods.extend(self._get_human_emulation_methods())
-                        page_methods.extend(self._get_hidden_extraction_methods())
-                        if self.extract_lazy_loaded and self.lazy_load_wait_time > 0:
-                            page_methods.append(PageMethod('wait_for_timeout', int(self.lazy_load_wait_time * 1000)))
+                        if self.browser_emulation:
+                            page_methods.extend(self.browser_emulation.get_page_methods())
+                        if self._lazy_load_wait:
+                            page_methods.append(self._lazy_load_wait)
                     
                     meta = {
                         'playwright': bool(page_methods),
                         'playwright_page_methods': page_methods,
                         'depth': depth + 1
                     }
+                    if page_methods and self.browser_emulation:
+                        # Скрипты эмуляции ставятся на страницу до навигации
+                        meta['playwright_page_init_callback'] = self.browser_emulation.init_page
                     yield scrapy.Request(absolute_link, callback=self.parse, meta=meta)
         
         # Генерируем запросы автоматической навигации
         if depth < self.config['crawling']['max_depth']:
-            navigation_requests = self.auto_navigation.generate_navigation_requests(response)
+            navigation_requests = await self.auto_navigation.generate_navigation_requests(response)
             for nav_request in navigation_requests:
                 yield nav_request
         
@@ -194,6 +213,9 @@ class ImageSpider(scrapy.Spider):
         # 8. Скрытые изображения (base64, canvas, WebGL, shadow DOM)
         img_urls.extend(self._extract_hidden_images_data(response))
         
+        # 9. Изображения из Ajax/API-ответа (извлекает AjaxInterceptorMiddleware)
+        img_urls.extend(response.meta.get('_ajax_images', ()))
+        
         # 3. Изображения из JavaScript (по типовым паттернам)
         script_tags = response.css('script::text').getall()
         all_scripts = " ".join(script_tags)
@@ -414,7 +436,8 @@ class ImageSpider(scrapy.Spider):
                 hidden_data = page.evaluate('() => window.hiddenImageExtraction || {}')
                 for key in ['base64Images', 'canvasImages', 'webglImages', 'shadowDomImages']:
                     if key in hidden_data and isinstance(hidden_data[key], list):
-                        img_urls.extend(hidden_data[key])
+                        # canvasImages содержит описания canvas, а не URL
+                        img_urls.extend(url for url in hidden_data[key] if isinstance(url, str))
                 
                 if img_urls:
                     self.logger.debug(f"Эмуляция человека обнаружила {len(img_urls)} изображений")
@@ -506,39 +529,6 @@ class ImageSpider(scrapy.Spider):
         
         return img_urls  # Не фильтруем base64, они валидны
     
-    def _get_network_interception_methods(self):
-        """Возвращает методы для перехвата сетевых запросов Playwright"""
-        from scrapy_playwright.page import PageMethod
-        
-        return [
-            PageMethod('route', '**/*.{jpg,jpeg,png,gif,webp,avif,svg,bmp,tiff}', self._intercept_image_request),
-            PageMethod('evaluate', '''
-                () => {
-                    window.interceptedImages = [];
-                    const originalFetch = window.fetch;
-                    window.fetch = function(...args) {
-                        const url = args[0];
-                        if (typeof url === 'string' && /\\.(jpg|jpeg|png|gif|webp|avif|svg|bmp|tiff)$/i.test(url)) {
-                            window.interceptedImages.push(url);
-                        }
-                        return originalFetch.apply(this, args);
-                    };
-                }
-            '''),
-            PageMethod('wait_for_timeout', self.config.get('crawling', {}).get('timeouts', {}).get('page_load_timeout', 2000)),
-        ]
-    
-    def _intercept_image_request(self, route):
-        """Перехватывает запросы изображений для анализа"""
-        request = route.request
-        
-        # Сохраняем URL перехваченного изображения
-        self.intercepted_images.add(request.url)
-        self.logger.debug(f"Перехвачено изображение: {request.url}")
-        
-        # Продолжаем запрос
-        route.continue_()
-    
     def _extract_intercepted_images(self, response):
         """Извлекает изображения, перехваченные через network monitoring"""
         img_urls = []
@@ -667,21 +657,3 @@ class ImageSpider(scrapy.Spider):
         except Exception as e:
             self.logger.debug(f"Ошибка парсинга srcset: {e}")
         return urls
-    
-    def _get_human_emulation_methods(self):
-        """Возвращает методы эмуляции человеческого поведения для Playwright"""
-        if self.human_emulation:
-            return self.human_emulation.get_page_methods()
-        return []
-    
-    def _get_network_interception_methods(self):
-        """Возвращает методы перехвата сетевых запросов"""
-        if self.network_capture:
-            return self.network_capture.get_page_methods()
-        return []
-    
-    def _get_hidden_extraction_methods(self):
-        """Возвращает методы извлечения скрытых изображений"""
-        if self.hidden_extractor:
-            return self.hidden_extractor.get_page_methods()
-        return []
@@ -3,10 +3,18 @@
 Сохраняет всю логику, только улучшает читаемость вывода
 """
 import os
+import atexit
 import hashlib
-from typing import Dict, Any
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, List
 from urllib.parse import urlparse
 
+LOG_FORMAT = '%(asctime)s [%(name)s] %(levelname)s: %(message)s'
+
 class CompactStatsFormatter:
     """Компактный форматтер статистики для краткого вывода"""
     
@@ -147,3 +155,123 @@ def format_stats_compact(pages=0, images=0, processed=0, errors=0):
     Компактная статистика в одну строку
     """
     return f"Страниц: {pages} | Изображений: {images} | Обработано: {processed} | Ошибок: {errors}"
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """
+    Formatter, который вызывает strftime не чаще раза в секунду
+    Записи в пределах одной секунды переиспользуют строку времени; миллисекунды добавляются как обычно
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_second = None
+        self._cached_time = ''
+    
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_time = time.strftime(datefmt or self.default_time_format, self.converter(second))
+            self._cached_second = second
+        if datefmt:
+            return self._cached_time
+        return self.default_msec_format % (self._cached_time, record.msecs)
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """
+    FileHandler с крупным буфером записи вместо сброса на диск после каждой строки
+    Записи WARNING и выше сбрасываются сразу, остальные — таймером раз в flush_interval секунд
+    """
+    
+    def __init__(self, filename, mode='a', encoding=None, buffer_size: int = 65536,
+                 flush_interval: float = 2.0):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._flush_timer = None
+        super().__init__(filename, mode, encoding)
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=self.errors)
+    
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+            return
+        
+        if record.levelno >= logging.WARNING:
+            self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self._timed_flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def _timed_flush(self):
+        self.acquire()
+        try:
+            self._flush_timer = None
+            self.flush()
+        finally:
+            self.release()
+    
+    def unbuffered_copy(self) -> logging.FileHandler:
+        """Обычный FileHandler на тот же файл с теми же форматтером и уровнем"""
+        handler = logging.FileHandler(self.baseFilename, 'a', self.encoding)
+        handler.setLevel(self.level)
+        handler.setFormatter(self.formatter)
+        return handler
+    
+    def close(self):
+        timer = self._flush_timer
+        if timer is not None:
+            timer.cancel()
+            self._flush_timer = None
+        super().close()
+
+
+def start_queue_logging(handlers: List[logging.Handler], level: int = logging.INFO) -> QueueListener:
+    """
+    Настраивает корневой логгер так, что запись в файл/консоль идёт в фоновом потоке
+    Логгер лишь кладёт записи в очередь; форматирование и ввод-вывод выполняет QueueListener
+    """
+    formatter = CachedTimeFormatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # В очередь уходит только текст сообщения; строку по LOG_FORMAT соберут обработчики
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(level=level, handlers=[queue_handler])
+    
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    def _flush_before_fork():
+        # Иначе несброшенный буфер скопируется в дочерний процесс и строки задвоятся
+        for handler in handlers:
+            handler.flush()
+    
+    def _use_direct_handlers():
+        # В дочернем процессе (fork) потока слушателя нет: пишем напрямую, как раньше.
+        # Дочерние процессы завершаются через os._exit, без сброса буферов и таймеров,
+        # поэтому буферизованный файл заменяется обычным FileHandler
+        root = logging.getLogger()
+        root.removeHandler(queue_handler)
+        for handler in handlers:
+            if isinstance(handler, BufferedFileHandler):
+                handler = handler.unbuffered_copy()
+            root.addHandler(handler)
+    
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(before=_flush_before_fork, after_in_child=_use_direct_handlers)
+    
+    return listener
@@ -252,7 +252,7 @@ def cmd_unit_human_emulation(args: argparse.Namespace) -> int:
         print(f"Сгенерировано PageMethod: {len(methods)}")
         
         # Тестируем JavaScript
-        js_script = module._get_emulation_script()
+        js_script = module._emulation_script
         print(f"JavaScript скрипт: {len(js_script)} символов")
         
         # Проверяем что JavaScript валидный
@@ -271,7 +271,9 @@ def cmd_unit_human_emulation(args: argparse.Namespace) -> int:
 def cmd_unit_network_capture(args: argparse.Namespace) -> int:
     _print_header("Юнит-тест: NetworkTrafficCapture")
     try:
-        from snapcrawler.core.human_emulation import NetworkTrafficCapture
+        from snapcrawler.core.human_emulation import (
+            NetworkTrafficCapture, _NETWORK_SETUP_SCRIPT, _NETWORK_COLLECTION_SCRIPT
+        )
         
         config = {
             'network_capture': {
@@ -290,8 +292,8 @@ def cmd_unit_network_capture(args: argparse.Namespace) -> int:
         print(f"Сгенерировано PageMethod: {len(methods)}")
         
         # Тестируем JavaScript
-        setup_script = module._get_network_setup_script()
-        collection_script = module._get_network_collection_script()
+        setup_script = _NETWORK_SETUP_SCRIPT
+        collection_script = _NETWORK_COLLECTION_SCRIPT
         
         if 'window.networkCapture' in setup_script and 'networkImageUrls' in collection_script:
             print("Итог: УСПЕХ")
@@ -308,7 +310,9 @@ def cmd_unit_network_capture(args: argparse.Namespace) -> int:
 def cmd_unit_hidden_extractor(args: argparse.Namespace) -> int:
     _print_header("Юнит-тест: HiddenImageExtractor")
     try:
-        from snapcrawler.core.human_emulation import HiddenImageExtractor
+        from snapcrawler.core.human_emulation import (
+            HiddenImageExtractor, _HIDDEN_COLLECTION_SCRIPT
+        )
         
         config = {
             'hidden_images': {
@@ -323,14 +327,13 @@ def cmd_unit_hidden_extractor(args: argparse.Namespace) -> int:
         print(f"Модуль создан: enabled={module.enabled}")
         print(f"Извлечение base64: {module.extract_base64}")
         print(f"Извлечение canvas: {module.extract_canvas}")
-        print(f"Извлечение shadow DOM: {module.extract_shadow_dom}")
         
         methods = module.get_page_methods()
         print(f"Сгенерировано PageMethod: {len(methods)}")
         
         # Тестируем JavaScript
-        extraction_script = module._get_hidden_extraction_script()
-        collection_script = module._get_hidden_collection_script()
+        extraction_script = module._extraction_script
+        collection_script = _HIDDEN_COLLECTION_SCRIPT
         
         if 'window.hiddenImageExtraction' in extraction_script and 'base64Images' in collection_script:
             print("Итог: УСПЕХ")
@@ -469,6 +472,49 @@ def cmd_unit_middlewares_advanced(args: argparse.Namespace) -> int:
         return 1
 
 
+def cmd_unit_ajax_interceptor(args: argparse.Namespace) -> int:
+    _print_header("Юнит-тест: AjaxInterceptorMiddleware (разбор JSON)")
+    try:
+        from snapcrawler import middlewares
+        from snapcrawler.middlewares import AjaxInterceptorMiddleware
+        
+        middleware = AjaxInterceptorMiddleware()
+        # Пустые и вложенные пустые объекты не должны ломать разбор
+        cases = [
+            (b'{}', set()),
+            (b'[]', set()),
+            (b'[{}, {"url": "http://x/a.jpg"}]', {'http://x/a.jpg'}),
+            (b'[[{}],{"img":"http://x/d.jpg"}]', {'http://x/d.jpg'}),
+            (b'{"a": {}, "photo": "http://x/b.png", "items": [{}, "http://x/c.gif"]}',
+             {'http://x/b.png', 'http://x/c.gif'}),
+            (b'{"img": {"src": "http://x/skip.jpg"}, "thumb": {}}', set()),
+        ]
+        
+        failed = 0
+        for body, expected in cases:
+            recursive = middleware.extract_from_json_recursive(json.loads(body))
+            results = {'recursive': recursive}
+            if middlewares.ijson is not None:
+                results['stream'] = middleware.extract_from_json_stream(body)
+            for name, found in results.items():
+                if found != expected:
+                    failed += 1
+                    print(f"ОШИБКА {name}: {body!r} -> {sorted(found)}, ожидалось {sorted(expected)}")
+        
+        if middlewares.ijson is None:
+            print("ijson не установлен: проверен только разбор через json.loads")
+        print(f"Проверено случаев: {len(cases)}")
+        if failed:
+            print("Итог: ОШИБКА")
+            return 1
+        print("Итог: УСПЕХ")
+        return 0
+        
+    except Exception as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+
 def cmd_unit_all_modules(args: argparse.Namespace) -> int:
     _print_header("Запуск всех юнит-тестов модулей")
     
@@ -480,6 +526,7 @@ def cmd_unit_all_modules(args: argparse.Namespace) -> int:
         ("SmartImageProcessor", cmd_unit_advanced_formats),
         ("AutoNavigationManager", cmd_unit_navigation_module),
         ("AdvancedStealthMiddleware", cmd_unit_middlewares_advanced),
+        ("AjaxInterceptorMiddleware", cmd_unit_ajax_interceptor),
     ]
     
     results = []
@@ -655,6 +702,7 @@ def build_parser() -> argparse.ArgumentParser:
     sub.add_parser("unit:advanced_formats", help="Юнит-тест: SmartImageProcessor")
     sub.add_parser("unit:navigation_module", help="Юнит-тест: AutoNavigationManager")
     sub.add_parser("unit:middlewares_advanced", help="Юнит-тест: AdvancedStealthMiddleware")
+    sub.add_parser("unit:ajax_interceptor", help="Юнит-тест: разбор JSON в AjaxInterceptorMiddleware")
     sub.add_parser("unit:all_modules", help="Запуск всех юнит-тестов модулей")
 
     p_sp = sub.add_parser("smoke:spider", help="Короткий запуск Scrapy с лимитами и таймаутом")
@@ -687,6 +735,7 @@ COMMANDS = {
     "unit:advanced_formats": cmd_unit_advanced_formats,
     "unit:navigation_module": cmd_unit_navigation_module,
     "unit:middlewares_advanced": cmd_unit_middlewares_advanced,
+    "unit:ajax_interceptor": cmd_unit_ajax_interceptor,
     "unit:all_modules": cmd_unit_all_modules,
     "smoke:spider": cmd_smoke_spider,
     "smoke:parallel": cmd_smoke_parallel,
@@ -705,6 +754,7 @@ COMMAND_HELP = {
     "unit:advanced_formats": "Тестирование процессора продвинутых форматов изображений.",
     "unit:navigation_module": "Тестирование модуля автоматической навигации.",
     "unit:middlewares_advanced": "Тестирование продвинутых middleware для обхода защиты.",
+    "unit:ajax_interceptor": "Разбор JSON в AjaxInterceptorMiddleware, включая пустые объекты.",
     "unit:all_modules": "Запуск всех юнит-тестов модулей подряд.",
     "smoke:spider": "Короткий сетевой запуск паука Scrapy с лимитами (item/depth).",
     "smoke:parallel": "Короткий сетевой запуск параллельной архитектуры через run_parallel.py.",
@@ -722,6 +772,7 @@ COMMAND_USAGE = {
     "unit:advanced_formats": "py test_runner.py unit:advanced_formats",
     "unit:navigation_module": "py test_runner.py unit:navigation_module",
     "unit:middlewares_advanced": "py test_runner.py unit:middlewares_advanced",
+    "unit:ajax_interceptor": "py test_runner.py unit:ajax_interceptor",
     "unit:all_modules": "py test_runner.py unit:all_modules",
     "smoke:spider": "py test_runner.py smoke:spider --timeout 60 --log INFO --item-limit 1 --depth 1",
     "smoke:parallel": "py test_runner.py smoke:parallel --timeout 60 --config config.yaml",